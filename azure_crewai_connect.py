@@ -1,5 +1,7 @@
 # azure_crewai_connect.py
 import os
+import threading
+import time
 from openai import AzureOpenAI
 from azure.identity import DefaultAzureCredential, get_bearer_token_provider
 from crewai import Agent, Task, Crew, Process
@@ -12,52 +14,163 @@ endpoint = os.getenv("AZURE_OPENAI_ENDPOINT")
 api_version = os.getenv("AZURE_OPENAI_API_VERSION")
 deployment = os.getenv("AZURE_OPENAI_DEPLOYMENT")
 
+DEFAULT_MAX_TOKENS = 4096  # Enough to ensure complete JSON responses
+DEFAULT_TEMPERATURE = 0.7
+
 token_provider = get_bearer_token_provider(
     DefaultAzureCredential(), "https://cognitiveservices.azure.com/.default"
 )
 
+# One client (and connection pool) shared by every role
+client = AzureOpenAI(
+    api_version=api_version,
+    azure_endpoint=endpoint,
+    azure_ad_token_provider=token_provider,
+)
+
+# Per-role call latency and token counts, aggregated across the process
+role_metrics = {}
+role_metrics_lock = threading.Lock()
+
+def role_setting(name, role, default=None):
+    """
+    Read AZURE_OPENAI_<NAME>_<ROLE> (e.g. AZURE_OPENAI_DEPLOYMENT_JOB_CRAWLER),
+    falling back to AZURE_OPENAI_<NAME> and then to default.
+    """
+    if role:
+        value = os.getenv(f"AZURE_OPENAI_{name}_{role.upper()}")
+        if value:
+            return value
+    return os.getenv(f"AZURE_OPENAI_{name}") or default
+
+def record_call(role, seconds, usage):
+    """Add one LLM call to the metrics of its role"""
+    with role_metrics_lock:
+        metrics = role_metrics.setdefault(role, {
+            "calls": 0,
+            "total_seconds": 0.0,
+            "last_seconds": 0.0,
+            "prompt_tokens": 0,
+            "cached_prompt_tokens": 0,
+            "completion_tokens": 0,
+        })
+        metrics["calls"] += 1
+        metrics["total_seconds"] += seconds
+        metrics["last_seconds"] = seconds
+        metrics["prompt_tokens"] += usage.get("prompt_tokens", 0)
+        metrics["cached_prompt_tokens"] += usage.get("cached_prompt_tokens", 0)
+        metrics["completion_tokens"] += usage.get("completion_tokens", 0)
+
+COUNTERS = ("calls", "total_seconds", "prompt_tokens", "cached_prompt_tokens", "completion_tokens")
+
+def get_role_metrics(since=None):
+    """
+    Snapshot of per-role metrics, with the average latency per call. With
+    since (an earlier snapshot), only the calls made after it are counted.
+    """
+    with role_metrics_lock:
+        snapshot = {role: dict(metrics) for role, metrics in role_metrics.items()}
+    for role, metrics in list(snapshot.items()):
+        earlier = (since or {}).get(role, {})
+        for counter in COUNTERS:
+            metrics[counter] -= earlier.get(counter, 0)
+        if not metrics["calls"]:
+            del snapshot[role]
+            continue
+        metrics["avg_seconds"] = metrics["total_seconds"] / metrics["calls"]
+    return snapshot
+
+def merge_role_metrics(total, metrics):
+    """Add a get_role_metrics snapshot into total (e.g. a job's timings)"""
+    for role, added in metrics.items():
+        merged = total.setdefault(role, {counter: 0 for counter in COUNTERS})
+        for counter in COUNTERS:
+            merged[counter] += added[counter]
+        merged["last_seconds"] = added["last_seconds"]
+        merged["avg_seconds"] = merged["total_seconds"] / merged["calls"]
+    return total
+
 # 👇 Define a CrewAI-compatible LLM provider
 
 class AzureCrewAILLM(BaseLLM):
-    def __init__(self):
-        self.client = AzureOpenAI(
-            api_version=api_version,
-            azure_endpoint=endpoint,
-            azure_ad_token_provider=token_provider,
+    """
+    Azure OpenAI LLM for one agent role.
+
+    Deployment, max_tokens and temperature can be set per role through
+    AZURE_OPENAI_DEPLOYMENT_<ROLE>, AZURE_OPENAI_MAX_TOKENS_<ROLE> and
+    AZURE_OPENAI_TEMPERATURE_<ROLE>, so cheap stages can be routed to a
+    smaller deployment. Explicit arguments take precedence.
+
+    static_prefix is sent as the first system message of every call; put the
+    long, job-independent instructions there so they hit the prompt cache.
+    """
+    def __init__(self, role=None, deployment_name=None, max_tokens=None, temperature=None,
+                 static_prefix=None):
+        self.client = client
+        self.role = role or "default"
+        self.deployment = deployment_name or role_setting("DEPLOYMENT", role, deployment)
+        self.max_tokens = int(max_tokens or role_setting("MAX_TOKENS", role, DEFAULT_MAX_TOKENS))
+        self.temperature = float(
+            temperature if temperature is not None
+            else role_setting("TEMPERATURE", role, DEFAULT_TEMPERATURE)
         )
-        self.deployment = deployment
+        self.static_prefix = static_prefix
         self._token_usage = {}  # ✅ required by CrewAI for summary
 
-    def call(self, prompt, **kwargs) -> str:
-        # CrewAI sometimes passes a list of strings → flatten them
+    def build_messages(self, prompt):
+        """
+        Chat messages for a CrewAI prompt, with the role's static prefix first.
+
+        System messages are kept ahead of the job-specific user content, so
+        the start of every request is byte-identical across jobs and can be
+        served from Azure OpenAI's prompt cache.
+        """
+        messages = []
+        if self.static_prefix:
+            messages.append({"role": "system", "content": self.static_prefix})
+
+        # CrewAI passes either a string, a list of strings, or chat messages
+        if isinstance(prompt, list) and all(isinstance(p, dict) and "role" in p for p in prompt):
+            messages.extend(
+                {"role": p["role"], "content": str(p.get("content", ""))}
+                for p in prompt
+            )
+            return messages
+
         if isinstance(prompt, list):
             prompt = "\n".join(str(p) for p in prompt)
+        messages.append({"role": "user", "content": str(prompt)})
+        return messages
 
+    def call(self, prompt, **kwargs) -> str:
+        started = time.perf_counter()
         response = self.client.chat.completions.create(
             model=self.deployment,
-            messages=[
-                {
-                    "role": "user",
-                    "content": [
-                        {"type": "text", "text": str(prompt)}
-                    ],
-                }
-            ],
-            temperature=kwargs.get("temperature", 0.7),
-            max_tokens=4096,  # Force 4096 tokens to ensure complete JSON responses
+            messages=self.build_messages(prompt),
+            temperature=kwargs.get("temperature", self.temperature),
+            max_tokens=self.max_tokens,
         )
+        elapsed = time.perf_counter() - started
 
         # --- extract token usage if present (Azure sometimes omits this) ---
+        # A fresh dict per call, so a response without usage records no tokens
+        # rather than the previous call's again
+        token_usage = {}
         try:
             usage = getattr(response, "usage", None)
             if usage:
-                self._token_usage = {
+                token_usage = {
                     "prompt_tokens": getattr(usage, "prompt_tokens", 0),
                     "completion_tokens": getattr(usage, "completion_tokens", 0),
                     "total_tokens": getattr(usage, "total_tokens", 0),
+                    "cached_prompt_tokens": getattr(
+                        getattr(usage, "prompt_tokens_details", None), "cached_tokens", 0
+                    ) or 0,
                 }
         except Exception:
-            self._token_usage = {}
+            token_usage = {}
+        self._token_usage = token_usage
+        record_call(self.role, elapsed, token_usage)
 
         # --- handle message content ---
         msg = response.choices[0].message
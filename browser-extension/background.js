@@ -1,5 +1,9 @@
 // Background service worker for the extension
 
+const BATCH_POLL_ALARM = 'pollBatch';
+// Finished batches kept for their download links, newest first
+const MAX_STORED_BATCHES = 5;
+
 chrome.runtime.onInstalled.addListener(() => {
   console.log('CrewAI Job Extractor installed');
 });
@@ -11,5 +15,167 @@ chrome.runtime.onMessage.addListener((request, sender, sendResponse) => {
     console.log('Processing job:', request.jobData);
     sendResponse({status: 'processing'});
   }
+  if (request.action === 'prefetchJob' && sender.tab) {
+    prefetchJob(sender.tab.id, request.jobData);
+  }
+  if (request.action === 'cancelPrefetch' && sender.tab) {
+    cancelPrefetch(sender.tab.id);
+  }
+  if (request.action === 'submitBatch') {
+    // The popup may close at any time, so the batch is owned by the worker
+    submitQueuedJobs(request.serverUrl)
+      .then((batch) => sendResponse({status: 'accepted', batch}))
+      .catch((error) => sendResponse({status: 'error', message: error.message}));
+  }
   return true;
 });
+
+chrome.tabs.onRemoved.addListener((tabId) => {
+  cancelPrefetch(tabId);
+});
+
+chrome.alarms.onAlarm.addListener((alarm) => {
+  if (alarm.name === BATCH_POLL_ALARM) {
+    pollBatch();
+  }
+});
+
+// Send every queued job to the server in a single request
+async function submitQueuedJobs(serverUrl) {
+  const {jobQueue = []} = await chrome.storage.local.get(['jobQueue']);
+  if (!jobQueue.length) {
+    throw new Error('No jobs queued');
+  }
+
+  const response = await fetch(`${serverUrl}/process-jobs`, {
+    method: 'POST',
+    headers: {
+      'Content-Type': 'application/json',
+    },
+    body: JSON.stringify({jobs: jobQueue})
+  });
+
+  if (!response.ok) {
+    throw new Error(`Server error: ${response.status}`);
+  }
+
+  const result = await response.json();
+  const batch = {...result.batch, serverUrl};
+  // Earlier batches keep running and keep their download links
+  const {batches = []} = await chrome.storage.local.get(['batches']);
+  await chrome.storage.local.set({
+    jobQueue: [],
+    batches: pruneBatches([batch, ...batches])
+  });
+  updateBadge([batch, ...batches]);
+  chrome.alarms.create(BATCH_POLL_ALARM, {periodInMinutes: 0.5});
+  return batch;
+}
+
+// Drop the oldest finished batches beyond MAX_STORED_BATCHES
+function pruneBatches(batches) {
+  let finished = 0;
+  return batches.filter((batch) => !isBatchFinished(batch) || ++finished <= MAX_STORED_BATCHES);
+}
+
+// Refresh per-job progress of every unfinished batch
+async function pollBatch() {
+  const {batches = []} = await chrome.storage.local.get(['batches']);
+  const running = batches.filter((batch) => !isBatchFinished(batch));
+  if (!running.length) {
+    chrome.alarms.clear(BATCH_POLL_ALARM);
+    return;
+  }
+
+  const updates = {};
+  for (const batch of running) {
+    try {
+      const response = await fetch(`${batch.serverUrl}/batches/${batch.id}`);
+      if (response.status === 404) {
+        // The server restarted or expired the batch; its jobs will not finish
+        updates[batch.id] = {
+          ...batch,
+          jobs: batch.jobs.map((job) => isJobFinished(job)
+            ? job
+            : {...job, status: 'error', message: 'Batch is no longer known to the server'})
+        };
+        continue;
+      }
+      if (!response.ok) {
+        throw new Error(`Server error: ${response.status}`);
+      }
+      const result = await response.json();
+      updates[batch.id] = {...result.batch, serverUrl: batch.serverUrl};
+    } catch (error) {
+      console.error(`Could not poll batch ${batch.id}:`, error);
+    }
+  }
+
+  // Re-read so a batch submitted while polling is not lost
+  const {batches: current = []} = await chrome.storage.local.get(['batches']);
+  const merged = current.map((batch) => updates[batch.id] || batch);
+  await chrome.storage.local.set({batches: pruneBatches(merged)});
+  updateBadge(merged);
+
+  if (merged.every(isBatchFinished)) {
+    chrome.alarms.clear(BATCH_POLL_ALARM);
+  }
+}
+
+function isJobFinished(job) {
+  return job.status === 'done' || job.status === 'error';
+}
+
+function isBatchFinished(batch) {
+  return batch.jobs.every(isJobFinished);
+}
+
+function updateBadge(batches) {
+  const jobs = batches.filter((batch) => !isBatchFinished(batch)).flatMap((batch) => batch.jobs);
+  const finished = jobs.filter(isJobFinished).length;
+  const text = finished === jobs.length ? '' : `${finished}/${jobs.length}`;
+  chrome.action.setBadgeText({text});
+}
+
+async function getServerUrl() {
+  const {serverUrl} = await chrome.storage.sync.get(['serverUrl']);
+  return serverUrl || 'http://localhost:5000';
+}
+
+// Ask the server to extract a posting ahead of time; remember it per tab
+async function prefetchJob(tabId, jobData) {
+  try {
+    const serverUrl = await getServerUrl();
+    const response = await fetch(`${serverUrl}/prefetch`, {
+      method: 'POST',
+      headers: {
+        'Content-Type': 'application/json',
+      },
+      body: JSON.stringify(jobData)
+    });
+    if (!response.ok) {
+      return;
+    }
+    const result = await response.json();
+    // Session storage survives the service worker being suspended
+    await chrome.storage.session.set({[`prefetch:${tabId}`]: {id: result.prefetch_id, serverUrl}});
+  } catch (error) {
+    // The server may simply not be running; prefetching is best effort
+    console.debug('Prefetch skipped:', error.message);
+  }
+}
+
+// The user left a posting without submitting it: drop the speculative work
+async function cancelPrefetch(tabId) {
+  const storageKey = `prefetch:${tabId}`;
+  const {[storageKey]: prefetch} = await chrome.storage.session.get([storageKey]);
+  if (!prefetch) {
+    return;
+  }
+  await chrome.storage.session.remove(storageKey);
+  try {
+    await fetch(`${prefetch.serverUrl}/prefetch/${prefetch.id}`, {method: 'DELETE'});
+  } catch (error) {
+    console.debug('Prefetch cancel skipped:', error.message);
+  }
+}
@@ -3,15 +3,166 @@
 
 console.log('CrewAI Job Extractor loaded on LinkedIn');
 
+// Speculative extraction: once the user has dwelt on a posting, send it to
+// the server so the extraction stage is done before they click the popup.
+const PREFETCH_DWELL_MS = 4000;
+let prefetchTimer = null;
+let prefetchedUrl = null;
+let lastUrl = window.location.href;
+
+function schedulePrefetch() {
+  clearTimeout(prefetchTimer);
+  prefetchTimer = setTimeout(() => {
+    chrome.storage.sync.get(['prefetchEnabled'], (result) => {
+      if (result.prefetchEnabled === false) {
+        return;
+      }
+      const jobData = extractJobData();
+      if (!jobData.title || !jobData.description.trim()) {
+        return;
+      }
+      prefetchedUrl = window.location.href;
+      chrome.runtime.sendMessage({action: 'prefetchJob', jobData});
+    });
+  }, PREFETCH_DWELL_MS);
+}
+
+function cancelPrefetch() {
+  clearTimeout(prefetchTimer);
+  if (prefetchedUrl) {
+    prefetchedUrl = null;
+    chrome.runtime.sendMessage({action: 'cancelPrefetch'});
+  }
+}
+
+// LinkedIn navigates between postings without reloading the page
+setInterval(() => {
+  if (window.location.href !== lastUrl) {
+    lastUrl = window.location.href;
+    cancelPrefetch();
+    schedulePrefetch();
+  }
+}, 1000);
+
+window.addEventListener('pagehide', cancelPrefetch);
+schedulePrefetch();
+
 // Listen for messages from the popup
 chrome.runtime.onMessage.addListener((request, sender, sendResponse) => {
   if (request.action === 'extractJob') {
     const jobData = extractJobData();
     sendResponse(jobData);
   }
+  if (request.action === 'extractJobCards') {
+    extractJobCards().then(sendResponse);
+  }
   return true;
 });
 
+// Extract every job card on a LinkedIn search results page.
+// Cards only carry title/company/location, so the description of each
+// posting is fetched from LinkedIn's public posting endpoint.
+async function extractJobCards() {
+  const cardSelectors = [
+    'li[data-occludable-job-id]',
+    '.job-card-container[data-job-id]',
+    '.jobs-search__results-list li',
+    '.base-card[data-entity-urn]'
+  ];
+  
+  let cards = [];
+  for (const selector of cardSelectors) {
+    cards = Array.from(document.querySelectorAll(selector));
+    if (cards.length) {
+      break;
+    }
+  }
+  
+  const jobs = [];
+  const seenIds = new Set();
+  for (const card of cards) {
+    const jobId = getJobId(card);
+    if (!jobId || seenIds.has(jobId)) {
+      continue;
+    }
+    seenIds.add(jobId);
+    
+    jobs.push({
+      title: firstText(card, [
+        '.job-card-list__title',
+        '.job-card-container__link strong',
+        '.base-search-card__title',
+        'a[href*="/jobs/view/"]'
+      ]),
+      company: firstText(card, [
+        '.job-card-container__primary-description',
+        '.artdeco-entity-lockup__subtitle',
+        '.base-search-card__subtitle'
+      ]),
+      location: firstText(card, [
+        '.job-card-container__metadata-item',
+        '.artdeco-entity-lockup__caption',
+        '.job-search-card__location'
+      ]),
+      description: '',
+      url: `https://www.linkedin.com/jobs/view/${jobId}/`,
+      extractedAt: new Date().toISOString()
+    });
+  }
+  
+  // Fetch descriptions a few at a time to stay gentle on LinkedIn
+  const concurrency = 3;
+  for (let i = 0; i < jobs.length; i += concurrency) {
+    await Promise.all(jobs.slice(i, i + concurrency).map(async (job) => {
+      job.description = await fetchJobDescription(job.url.match(/\/view\/(\d+)/)[1]);
+    }));
+  }
+  
+  return jobs;
+}
+
+function getJobId(card) {
+  const direct = card.getAttribute('data-occludable-job-id') || card.getAttribute('data-job-id');
+  if (direct) {
+    return direct;
+  }
+  const urn = card.getAttribute('data-entity-urn') ||
+              (card.querySelector('[data-entity-urn]') || {getAttribute: () => ''}).getAttribute('data-entity-urn');
+  const urnMatch = urn && urn.match(/(\d+)$/);
+  if (urnMatch) {
+    return urnMatch[1];
+  }
+  const link = card.querySelector('a[href*="/jobs/view/"]');
+  const linkMatch = link && link.href.match(/\/jobs\/view\/(?:[^/]*-)?(\d+)/);
+  return linkMatch ? linkMatch[1] : null;
+}
+
+function firstText(root, selectors) {
+  for (const selector of selectors) {
+    const element = root.querySelector(selector);
+    if (element && element.textContent.trim()) {
+      return element.textContent.trim().replace(/\s+/g, ' ');
+    }
+  }
+  return '';
+}
+
+async function fetchJobDescription(jobId) {
+  try {
+    const response = await fetch(`https://www.linkedin.com/jobs-guest/jobs/api/jobPosting/${jobId}`);
+    if (!response.ok) {
+      return '';
+    }
+    const doc = new DOMParser().parseFromString(await response.text(), 'text/html');
+    const element = doc.querySelector('.show-more-less-html__markup') ||
+                    doc.querySelector('.description__text');
+    return element ? element.textContent.trim() : '';
+  } catch (error) {
+    console.error('Could not fetch job description:', error);
+    return '';
+  }
+}
+
 function extractJobData() {
   const data = {
     title: '',
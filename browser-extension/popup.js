@@ -2,6 +2,8 @@ document.addEventListener('DOMContentLoaded', function() {
   const extractBtn = document.getElementById('extractBtn');
   const statusDiv = document.getElementById('status');
   const serverUrlInput = document.getElementById('serverUrl');
+  const captureAllBtn = document.getElementById('captureAllBtn');
+  const batchDiv = document.getElementById('batch');
   
   // Load saved server URL
   chrome.storage.sync.get(['serverUrl'], function(result) {
@@ -15,6 +17,15 @@ document.addEventListener('DOMContentLoaded', function() {
     chrome.storage.sync.set({serverUrl: serverUrlInput.value});
   });
   
+  // Speculative extraction of opened postings (see content.js)
+  const prefetchInput = document.getElementById('prefetchEnabled');
+  chrome.storage.sync.get(['prefetchEnabled'], function(result) {
+    prefetchInput.checked = result.prefetchEnabled !== false;
+  });
+  prefetchInput.addEventListener('change', function() {
+    chrome.storage.sync.set({prefetchEnabled: prefetchInput.checked});
+  });
+  
   extractBtn.addEventListener('click', async function() {
     extractBtn.disabled = true;
     updateStatus('Extracting job posting...', 'loading');
@@ -61,7 +72,9 @@ document.addEventListener('DOMContentLoaded', function() {
       
       const result = await response.json();
       
-      updateStatus('✅ Success! CV and cover letter generated. Check your output folder.', 'success');
+      // Fetch the generated documents straight from the server
+      downloadArtifacts(serverUrl, result, jobData);
+      updateStatus('✅ Success! CV and cover letter generated and downloaded.', 'success');
       
       // Keep success message for 5 seconds
       setTimeout(() => {
@@ -76,6 +89,115 @@ document.addEventListener('DOMContentLoaded', function() {
     }
   });
   
+  captureAllBtn.addEventListener('click', async function() {
+    captureAllBtn.disabled = true;
+    updateStatus('Capturing job postings...', 'loading');
+    
+    try {
+      const jobs = await captureJobs();
+      
+      if (!jobs.length) {
+        updateStatus('No job postings found. Open a LinkedIn search results page or job tabs.', 'error');
+        captureAllBtn.disabled = false;
+        return;
+      }
+      
+      // Queue locally first so nothing is lost if the server is unreachable
+      const {jobQueue = []} = await chrome.storage.local.get(['jobQueue']);
+      await chrome.storage.local.set({jobQueue: jobQueue.concat(jobs)});
+      
+      updateStatus(`Captured ${jobs.length} jobs. Sending batch to CrewAI...`, 'loading');
+      
+      const serverUrl = serverUrlInput.value || 'http://localhost:5000';
+      const response = await chrome.runtime.sendMessage({action: 'submitBatch', serverUrl});
+      
+      if (response.status !== 'accepted') {
+        throw new Error(response.message);
+      }
+      
+      updateStatus(`✅ Batch of ${response.batch.jobs.length} jobs queued. You can close this popup.`, 'success');
+      captureAllBtn.disabled = false;
+      
+    } catch (error) {
+      console.error('Error:', error);
+      updateStatus(`❌ Error: ${error.message}. Queued jobs will be sent with the next batch.`, 'error');
+      captureAllBtn.disabled = false;
+    }
+  });
+  
+  // Collect jobs from a search results page, or from every open job tab
+  async function captureJobs() {
+    const [activeTab] = await chrome.tabs.query({active: true, currentWindow: true});
+    
+    if (activeTab && /linkedin\.com\/jobs\/(search|collections)/.test(activeTab.url)) {
+      return await chrome.tabs.sendMessage(activeTab.id, {action: 'extractJobCards'});
+    }
+    
+    const jobTabs = await chrome.tabs.query({url: 'https://www.linkedin.com/jobs/view/*'});
+    const jobs = [];
+    for (const tab of jobTabs) {
+      try {
+        const results = await chrome.scripting.executeScript({
+          target: {tabId: tab.id},
+          function: extractJobData
+        });
+        if (results && results[0] && results[0].result && results[0].result.title) {
+          jobs.push(results[0].result);
+        }
+      } catch (error) {
+        console.error(`Could not extract tab ${tab.id}:`, error);
+      }
+    }
+    return jobs;
+  }
+  
+  function downloadArtifacts(serverUrl, job, jobData) {
+    if (!job.artifacts) {
+      return;
+    }
+    const label = [jobData.company, jobData.title].filter(Boolean).join(' - ') || job.job_id;
+    chrome.downloads.download({
+      url: `${serverUrl}${job.artifacts.zip}`,
+      filename: `crewai-jobs/${label.replace(/[\\/:*?"<>|]/g, '_')}.zip`
+    });
+  }
+  
+  // Show per-job progress of recent batches, kept fresh by the background worker
+  function renderBatches(batches) {
+    batchDiv.textContent = '';
+    const icons = {queued: '⏳', processing: '⚙️', done: '✅', error: '❌'};
+    for (const batch of batches || []) {
+      for (const job of batch.jobs) {
+        const row = document.createElement('div');
+        row.className = 'batch-job';
+        const label = document.createElement('span');
+        label.textContent = [job.title, job.company].filter(Boolean).join(' · ') || job.url;
+        label.title = job.message || job.url;
+        const state = document.createElement('span');
+        state.textContent = `${icons[job.status] || ''} ${job.status}`;
+        row.append(label, state);
+        if (job.status === 'done' && job.artifacts) {
+          row.style.cursor = 'pointer';
+          state.textContent += ' ⬇️';
+          row.addEventListener('click', function() {
+            downloadArtifacts(batch.serverUrl, {job_id: job.id, artifacts: job.artifacts}, job);
+          });
+        }
+        batchDiv.appendChild(row);
+      }
+    }
+  }
+  
+  chrome.storage.local.get(['batches'], function(result) {
+    renderBatches(result.batches);
+  });
+  
+  chrome.storage.onChanged.addListener(function(changes, area) {
+    if (area === 'local' && changes.batches) {
+      renderBatches(changes.batches.newValue);
+    }
+  });
+  
   function updateStatus(message, type) {
     statusDiv.textContent = message;
     statusDiv.className = 'status ' + type;
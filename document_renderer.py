@@ -0,0 +1,468 @@
+"""
+Rendering of CV and cover letter models into PDF and JPEG artifacts
+"""
+
+import hashlib
+import json
+import multiprocessing
+import os
+import re
+import resource
+import shutil
+import sys
+import threading
+from collections import namedtuple
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from pathlib import Path
+
+from pybars import Compiler
+from weasyprint import HTML, CSS
+from weasyprint.text.fonts import FontConfiguration
+from pdf2image import convert_from_path
+
+BASE_DIR = Path(__file__).resolve().parent
+CV_TEMPLATE_PATH = BASE_DIR / "templates" / "cv_template.html"
+COVER_LETTER_TEMPLATE_PATH = BASE_DIR / "templates" / "cover_letter_template.html"
+RENDER_CACHE_DIR = Path(os.getenv("RENDER_CACHE_DIR", BASE_DIR / "output" / ".render_cache"))
+# Least recently used entries are pruned once the cache grows past this size
+RENDER_CACHE_MAX_MB = int(os.getenv("RENDER_CACHE_MAX_MB", "200"))
+
+# Page budget for the CV; overflowing content is trimmed locally to fit
+CV_MAX_PAGES = int(os.getenv("CV_MAX_PAGES", "1"))
+
+# Render worker settings. RENDER_WORKERS=0 (the default) renders in the
+# calling process; workers only pay off in a process that renders many jobs.
+RENDER_WORKERS = int(os.getenv("RENDER_WORKERS", "0"))
+RENDER_WORKER_MAX_JOBS = int(os.getenv("RENDER_WORKER_MAX_JOBS", "25"))
+RENDER_WORKER_MAX_RSS_MB = int(os.getenv("RENDER_WORKER_MAX_RSS_MB", "768"))
+# Hard address-space ceiling per worker (RLIMIT_AS); 0 disables it
+RENDER_WORKER_MEMORY_LIMIT_MB = int(os.getenv("RENDER_WORKER_MEMORY_LIMIT_MB", "0"))
+
+STYLE_BLOCK = re.compile(r'<style[^>]*>(.*?)</style>', re.IGNORECASE | re.DOTALL)
+
+# Process-wide font state shared by every render, so fontconfig lookups and
+# @font-face resolution are done once per worker rather than once per document
+FONT_CONFIG = FontConfiguration()
+
+LoadedTemplate = namedtuple('LoadedTemplate', ['mtime', 'source', 'compiled', 'stylesheets'])
+_template_cache = {}
+
+def read_template(template_path):
+    """Read template source from disk"""
+    with open(template_path, 'r') as file:
+        return file.read()
+
+def load_template(template_path):
+    """
+    Compile a template and parse its inline CSS, once per template file.
+
+    The <style> blocks are pulled out of the template into pre-parsed CSS
+    objects, so repeated renders skip both Handlebars compilation and CSS
+    parsing. Entries are refreshed when the template file changes on disk.
+    """
+    template_path = str(template_path)
+    mtime = os.stat(template_path).st_mtime_ns
+    loaded = _template_cache.get(template_path)
+    if loaded and loaded.mtime == mtime:
+        return loaded
+
+    source = read_template(template_path)
+    stylesheets = [
+        CSS(string=css, font_config=FONT_CONFIG)
+        for css in STYLE_BLOCK.findall(source)
+    ]
+    compiled = Compiler().compile(STYLE_BLOCK.sub('', source))
+    loaded = LoadedTemplate(mtime, source, compiled, stylesheets)
+    _template_cache[template_path] = loaded
+    return loaded
+
+def render_template(template_path, data):
+    """Render HTML template with given data"""
+    return load_template(template_path).compiled(data.model_dump())
+
+def render_key(template_path, data, max_pages=None):
+    """Hash of the validated model dump, template content and page budget"""
+    digest = hashlib.sha256()
+    digest.update(load_template(template_path).source.encode('utf-8'))
+    digest.update(b'\0')
+    digest.update(data.model_dump_json().encode('utf-8'))
+    digest.update(f"\0max_pages={max_pages}".encode('utf-8'))
+    return digest.hexdigest()
+
+def layout(html_content, stylesheets):
+    """Lay out HTML with the shared font configuration"""
+    return HTML(string=html_content).render(stylesheets=stylesheets, font_config=FONT_CONFIG)
+
+def write_pdf_and_jpeg(document, pdf_path, jpg_path):
+    """
+    Write a laid-out document to a PDF on disk and rasterize its first page.
+
+    Only page one is rasterized, by pdftoppm straight to a JPEG file, so no
+    page image is ever held in memory.
+    """
+    document.write_pdf(pdf_path)
+    jpg_path = Path(jpg_path)
+    paths = convert_from_path(
+        pdf_path,
+        first_page=1,
+        last_page=1,
+        fmt='jpeg',
+        jpegopt={'quality': 95},
+        output_folder=jpg_path.parent,
+        output_file=f".{jpg_path.stem}.{os.getpid()}",
+        single_file=True,
+        paths_only=True
+    )
+    if paths:
+        os.replace(paths[0], jpg_path)
+
+def _removable_items(data):
+    """
+    Optional CV content that can be dropped without breaking models.CV
+    minimums, grouped by kind and ordered lowest-ranked first. Writers list
+    the most relevant items first, so later entries rank lower.
+    """
+    achievements = [
+        (f"education[{e}].achievements[{a}]", data['education'][e]['achievements'], a)
+        for e in reversed(range(len(data['education'])))
+        for a in reversed(range(len(data['education'][e]['achievements'])))
+    ]
+    certifications = [
+        (f"certifications[{c}]", data['certifications'], c)
+        for c in reversed(range(len(data['certifications'])))
+    ]
+    # Keep at least one responsibility per role, trimming older roles first
+    responsibilities = [
+        (f"experience[{e}].responsibilities[{r}]", data['experience'][e]['responsibilities'], r)
+        for e in reversed(range(len(data['experience'])))
+        for r in reversed(range(1, len(data['experience'][e]['responsibilities'])))
+    ]
+    skills = [
+        (f"technical_skills[{t}]", data['technical_skills'], t)
+        for t in reversed(range(1, len(data['technical_skills'])))
+    ]
+    return [group for group in (certifications, achievements, responsibilities, skills) if group]
+
+def fit_to_pages(model, template_path, max_pages):
+    """
+    Lay out a CV and, while it runs past max_pages, drop its lowest-ranked
+    bullet, achievement, certification or skill, taking turns between those
+    kinds so no single section is emptied first. Each step costs one layout,
+    not an LLM call. Returns (model, document, report); the document of the
+    final layout is reused for writing the PDF. If the CV still overflows
+    with nothing left to drop, the untrimmed CV is returned instead.
+    """
+    loaded = load_template(template_path)
+    data = model.model_dump()
+    document = untrimmed_document = layout(loaded.compiled(data), loaded.stylesheets)
+    report = {"pages": len(document.pages), "fitted_pages": len(document.pages), "trimmed": []}
+
+    step = 0
+    while len(document.pages) > max_pages:
+        groups = _removable_items(data)
+        if not groups:
+            break
+        label, items, index = groups[step % len(groups)][0]
+        report["trimmed"].append({"item": label, "text": items.pop(index)})
+        document = layout(loaded.compiled(data), loaded.stylesheets)
+        step += 1
+
+    if len(document.pages) > max_pages:
+        # Trimming cannot make it fit, so keep all of the content
+        report["trimmed"] = []
+        return model, untrimmed_document, report
+
+    report["fitted_pages"] = len(document.pages)
+    if report["trimmed"]:
+        model = type(model).model_validate(data)
+        report["data"] = model.model_dump(mode='json')
+    return model, document, report
+
+def render_document(name, template_path, data, output_dir, cache_dir=RENDER_CACHE_DIR, max_pages=None):
+    """
+    Render one document into output_dir as <name>.pdf and <name>.jpg.
+
+    Artifacts are stored in cache_dir under the render key, so a document whose
+    model data and template are unchanged is copied from the cache instead of
+    going through WeasyPrint layout and rasterization again. With max_pages,
+    the document is first fitted to that many pages (see fit_to_pages); the
+    fit report is cached alongside the artifacts.
+    Returns (pdf_path, jpg_path, cached, fit_report).
+    """
+    key = render_key(template_path, data, max_pages)
+    cached_pdf = Path(cache_dir) / f"{key}.pdf"
+    cached_jpg = Path(cache_dir) / f"{key}.jpg"
+    cached_report = Path(cache_dir) / f"{key}.json"
+
+    cached = cached_pdf.exists() and cached_jpg.exists() and cached_report.exists()
+    if cached:
+        with open(cached_report) as file:
+            report = json.load(file)
+        # Mark the entry as recently used for prune_render_cache
+        try:
+            os.utime(cached_report)
+        except OSError:
+            pass
+    else:
+        os.makedirs(cache_dir, exist_ok=True)
+        if max_pages:
+            data, document, report = fit_to_pages(data, template_path, max_pages)
+        else:
+            loaded = load_template(template_path)
+            document = layout(loaded.compiled(data.model_dump()), loaded.stylesheets)
+            report = {"pages": len(document.pages)}
+
+        tmp_pdf = cached_pdf.with_suffix(f".pdf.{os.getpid()}.tmp")
+        tmp_jpg = cached_jpg.with_suffix(f".{os.getpid()}.jpg.tmp")
+        tmp_report = cached_report.with_suffix(f".json.{os.getpid()}.tmp")
+        write_pdf_and_jpeg(document, tmp_pdf, tmp_jpg)
+        with open(tmp_report, 'w') as file:
+            json.dump(report, file)
+        # Publish atomically so a concurrent render never sees a partial file
+        os.replace(tmp_pdf, cached_pdf)
+        os.replace(tmp_jpg, cached_jpg)
+        os.replace(tmp_report, cached_report)
+        written = [key]
+
+        if report.get("trimmed"):
+            # The fitted data is what gets saved back as the CV; cache the
+            # artifacts under its key too so re-rendering it is a cache hit
+            fitted_key = render_key(template_path, data, max_pages)
+            fitted_report = {"pages": report["fitted_pages"], "fitted_pages": report["fitted_pages"], "trimmed": []}
+            for source, suffix in ((cached_pdf, ".pdf"), (cached_jpg, ".jpg")):
+                tmp_copy = Path(cache_dir) / f"{fitted_key}{suffix}.{os.getpid()}.tmp"
+                shutil.copyfile(source, tmp_copy)
+                os.replace(tmp_copy, Path(cache_dir) / f"{fitted_key}{suffix}")
+            tmp_report = Path(cache_dir) / f"{fitted_key}.json.{os.getpid()}.tmp"
+            with open(tmp_report, 'w') as file:
+                json.dump(fitted_report, file)
+            os.replace(tmp_report, Path(cache_dir) / f"{fitted_key}.json")
+            written.append(fitted_key)
+
+        prune_render_cache(cache_dir, keep=written)
+
+    pdf_path = os.path.join(output_dir, f"{name}.pdf")
+    jpg_path = os.path.join(output_dir, f"{name}.jpg")
+    shutil.copyfile(cached_pdf, pdf_path)
+    shutil.copyfile(cached_jpg, jpg_path)
+    return pdf_path, jpg_path, cached, report
+
+def prune_render_cache(cache_dir=RENDER_CACHE_DIR, max_mb=RENDER_CACHE_MAX_MB, keep=()):
+    """
+    Delete least recently used cache entries until the cache fits in max_mb.
+
+    An entry is the PDF, JPEG and report sharing one render key; its last use
+    is the newest mtime among them (cache hits touch the report). Keys in keep
+    are never deleted. Returns the number of entries removed.
+    """
+    if max_mb <= 0:
+        return 0
+    entries = {}
+    for path in Path(cache_dir).iterdir():
+        # Skip files of renders still in progress
+        if path.name.startswith('.') or path.name.endswith('.tmp'):
+            continue
+        key = path.name.split('.', 1)[0]
+        try:
+            stat = path.stat()
+        except OSError:
+            continue
+        size, used, paths = entries.get(key, (0, 0, []))
+        entries[key] = (size + stat.st_size, max(used, stat.st_mtime), paths + [path])
+
+    total = sum(size for size, _, _ in entries.values())
+    removed = 0
+    for key, (size, _, paths) in sorted(entries.items(), key=lambda item: item[1][1]):
+        if total <= max_mb * 1024 * 1024:
+            break
+        if key in keep:
+            continue
+        for path in paths:
+            try:
+                path.unlink()
+            except OSError:
+                pass
+        total -= size
+        removed += 1
+    return removed
+
+def render_documents(cv, cover_letter, output_dir):
+    """Render the CV and cover letter, reusing cached artifacts where possible"""
+    os.makedirs(output_dir, exist_ok=True)
+
+    cv_pdf_path, cv_jpg_path, cv_cached, cv_fit = render_document(
+        "cv", CV_TEMPLATE_PATH, cv, output_dir, max_pages=CV_MAX_PAGES
+    )
+    cl_pdf_path, cl_jpg_path, cl_cached, cl_fit = render_document(
+        "cover_letter", COVER_LETTER_TEMPLATE_PATH, cover_letter, output_dir
+    )
+
+    return {
+        "files": {
+            "cv_jpg": cv_jpg_path,
+            "cv_pdf": cv_pdf_path,
+            "cover_letter_jpg": cl_jpg_path,
+            "cover_letter_pdf": cl_pdf_path
+        },
+        "cached": {
+            "cv": cv_cached,
+            "cover_letter": cl_cached
+        },
+        "fit": {
+            "cv": cv_fit,
+            "cover_letter": cl_fit
+        }
+    }
+
+def current_rss_mb():
+    """Resident set size of this process in MB"""
+    try:
+        with open('/proc/self/statm') as file:
+            resident_pages = int(file.read().split()[1])
+        return resident_pages * os.sysconf('SC_PAGE_SIZE') / (1024 * 1024)
+    except (OSError, ValueError):
+        return peak_rss_mb()
+
+def reset_peak_rss():
+    """
+    Reset this process's RSS high-water mark, so peak_rss_mb covers only what
+    follows. Linux only; returns False where the mark cannot be reset.
+    """
+    try:
+        with open('/proc/self/clear_refs', 'w') as file:
+            file.write('5')
+        return True
+    except OSError:
+        return False
+
+def peak_rss_mb():
+    """Peak resident set size of this process in MB, since the last reset_peak_rss"""
+    try:
+        with open('/proc/self/status') as file:
+            for line in file:
+                if line.startswith('VmHWM:'):
+                    return int(line.split()[1]) / 1024
+    except (OSError, ValueError):
+        pass
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is reported in bytes on macOS and in kilobytes elsewhere
+    return peak / (1024 * 1024) if sys.platform == 'darwin' else peak / 1024
+
+# ProcessPoolExecutor(max_tasks_per_child=...) needs Python 3.11
+MAX_TASKS_PER_CHILD_SUPPORTED = sys.version_info >= (3, 11)
+_worker_jobs = 0
+
+def _init_render_worker(memory_limit_mb):
+    """Apply the hard memory ceiling inside a fresh render worker"""
+    if memory_limit_mb:
+        limit = memory_limit_mb * 1024 * 1024
+        resource.setrlimit(resource.RLIMIT_AS, (limit, limit))
+
+def _render_measured(cv, cover_letter, output_dir):
+    """
+    Render and report memory use. The peak is per render where the high-water
+    mark can be reset ("render_peak_rss_mb"), otherwise it is the peak over
+    the process's whole life ("process_peak_rss_mb").
+    """
+    rss_before = current_rss_mb()
+    peak_label = "render_peak_rss_mb" if reset_peak_rss() else "process_peak_rss_mb"
+    rendered = render_documents(cv, cover_letter, output_dir)
+    rendered["memory"] = {
+        "rss_before_mb": round(rss_before, 1),
+        "rss_mb": round(current_rss_mb(), 1),
+        peak_label: round(peak_rss_mb(), 1)
+    }
+    return rendered
+
+def _render_in_worker(cv, cover_letter, output_dir):
+    """Render in a worker process and report its memory use"""
+    global _worker_jobs
+    _worker_jobs += 1
+    rendered = _render_measured(cv, cover_letter, output_dir)
+    rendered["memory"].update({"worker_pid": os.getpid(), "worker_jobs": _worker_jobs})
+    return rendered
+
+class RenderWorkerPool:
+    """
+    Renders documents in child processes so WeasyPrint layout trees never
+    accumulate in a long-lived parent. A worker is replaced after max_jobs
+    renders (before Python 3.11, the whole pool after max_jobs renders per
+    worker), and the pool is recycled as soon as a worker reports an RSS
+    above max_rss_mb or dies on the memory_limit_mb ceiling.
+    """
+    def __init__(self, workers=RENDER_WORKERS, max_jobs=RENDER_WORKER_MAX_JOBS,
+                 max_rss_mb=RENDER_WORKER_MAX_RSS_MB, memory_limit_mb=RENDER_WORKER_MEMORY_LIMIT_MB):
+        self.workers = workers
+        self.max_jobs = max_jobs
+        self.max_rss_mb = max_rss_mb
+        self.memory_limit_mb = memory_limit_mb
+        self._executor = None
+        self._submitted = 0
+        self._lock = threading.Lock()
+
+    def _get_executor(self):
+        with self._lock:
+            if self._executor is None:
+                # max_tasks_per_child cannot be combined with the fork start method
+                method = 'forkserver' if 'forkserver' in multiprocessing.get_all_start_methods() else 'spawn'
+                options = {}
+                if MAX_TASKS_PER_CHILD_SUPPORTED:
+                    options['max_tasks_per_child'] = self.max_jobs
+                self._executor = ProcessPoolExecutor(
+                    max_workers=self.workers,
+                    mp_context=multiprocessing.get_context(method),
+                    initializer=_init_render_worker,
+                    initargs=(self.memory_limit_mb,),
+                    **options
+                )
+                self._submitted = 0
+            if not MAX_TASKS_PER_CHILD_SUPPORTED:
+                self._submitted += 1
+            return self._executor
+
+    def recycle(self, executor=None):
+        """Retire the current workers; the next render starts fresh ones"""
+        with self._lock:
+            if executor is None or executor is self._executor:
+                executor, self._executor = self._executor, None
+        if executor is not None:
+            # In-flight renders on the old workers still complete
+            executor.shutdown(wait=False)
+
+    def render(self, cv, cover_letter, output_dir):
+        """Render the CV and cover letter in a worker process"""
+        executor = self._get_executor()
+        try:
+            rendered = executor.submit(_render_in_worker, cv, cover_letter, output_dir).result()
+        except (BrokenProcessPool, MemoryError):
+            self.recycle(executor)
+            raise
+        if rendered["memory"]["rss_mb"] > self.max_rss_mb:
+            self.recycle(executor)
+            rendered["memory"]["recycled"] = True
+        elif not MAX_TASKS_PER_CHILD_SUPPORTED and self._submitted >= self.max_jobs * self.workers:
+            # Without max_tasks_per_child, retire the whole pool after as many renders
+            self.recycle(executor)
+            rendered["memory"]["recycled"] = True
+        return rendered
+
+_render_pool = None
+_render_pool_lock = threading.Lock()
+
+def get_render_pool():
+    """Process-wide render worker pool"""
+    global _render_pool
+    with _render_pool_lock:
+        if _render_pool is None:
+            _render_pool = RenderWorkerPool()
+        return _render_pool
+
+def render_documents_isolated(cv, cover_letter, output_dir):
+    """
+    Render through the worker pool, or in-process when RENDER_WORKERS is 0.
+    Either way the result reports memory use under "memory".
+    """
+    if RENDER_WORKERS <= 0:
+        return _render_measured(cv, cover_letter, output_dir)
+    return get_render_pool().render(cv, cover_letter, output_dir)
@@ -1,27 +1,27 @@
 from dotenv import load_dotenv
-from crewai import Agent, Task, Crew, Process
+from crewai import Agent, Task, Crew
 from crewai.tools import BaseTool
 import requests
 import os
 from bs4 import BeautifulSoup
 import json
-import re
+import functools
+import time
+import argparse
+import sys
 from pathlib import Path
-from datetime import date
-from models import CV, CoverLetter
-from weasyprint import HTML
-from PIL import Image
-from pdf2image import convert_from_bytes
-from pybars import Compiler
-from azure_crewai_connect import AzureCrewAILLM
+from models import CV, CoverLetter, Experience
+from json_extractor import extract_json
+from job_ledger import job_id_for, parse_batch_line
+from document_renderer import render_documents_isolated
+from azure_crewai_connect import AzureCrewAILLM, get_role_metrics, merge_role_metrics
 from typing import Type
 from pydantic import BaseModel, Field
 
 # Load environment variables
 load_dotenv()
 
-# Initialize the LLM with Azure AD authentication
-model = AzureCrewAILLM()
+BASE_DIR = Path(__file__).resolve().parent
 
 # Tool Input Schemas
 class ReadFileInput(BaseModel):
@@ -142,53 +142,19 @@ class RenderAndSaveDocumentsTool(BaseTool):
 
     def _run(self, cv_data: dict, cover_letter_data: dict, output_dir: str) -> str:
         try:
-            os.makedirs(output_dir, exist_ok=True)
-            
             cv = CV(**cv_data)
             cover_letter = CoverLetter(**cover_letter_data)
-            
-            def render_template(template_path, data):
-                with open(template_path, 'r') as file:
-                    template_content = file.read()
-                compiler = Compiler()
-                template = compiler.compile(template_content)
-                return template(data.model_dump())
-            
-            def html_to_jpeg(html_content, output_path):
-                pdf = HTML(string=html_content).write_pdf()
-                images = convert_from_bytes(pdf)
-                if images:
-                    images[0].save(output_path, 'JPEG', quality=95)
-            
-            def html_to_pdf(html_content, output_path):
-                HTML(string=html_content).write_pdf(output_path)
-            
-            cv_template_path = "templates/cv_template.html"
-            cv_html = render_template(cv_template_path, cv)
-            
-            cv_jpg_path = os.path.join(output_dir, "cv.jpg")
-            cv_pdf_path = os.path.join(output_dir, "cv.pdf")
-            
-            html_to_jpeg(cv_html, cv_jpg_path)
-            html_to_pdf(cv_html, cv_pdf_path)
-            
-            cl_template_path = "templates/cover_letter_template.html"
-            cl_html = render_template(cl_template_path, cover_letter)
-            
-            cl_jpg_path = os.path.join(output_dir, "cover_letter.jpg")
-            cl_pdf_path = os.path.join(output_dir, "cover_letter.pdf")
-            
-            html_to_jpeg(cl_html, cl_jpg_path)
-            html_to_pdf(cl_html, cl_pdf_path)
-            
+
+            # Unchanged documents are reused from the render cache; the rest
+            # are rendered in a memory-bounded worker process
+            rendered = render_documents_isolated(cv, cover_letter, output_dir)
+
             return json.dumps({
                 "success": True,
-                "files": {
-                    "cv_jpg": cv_jpg_path,
-                    "cv_pdf": cv_pdf_path,
-                    "cover_letter_jpg": cl_jpg_path,
-                    "cover_letter_pdf": cl_pdf_path
-                }
+                "files": rendered["files"],
+                "cached": rendered["cached"],
+                "fit": rendered["fit"],
+                "memory": rendered["memory"]
             })
         except Exception as e:
             return json.dumps({
@@ -196,10 +162,114 @@ class RenderAndSaveDocumentsTool(BaseTool):
                 "error": str(e)
             })
 
+# Static role instructions. They are sent, together with the base documents,
+# as a byte-stable prefix ahead of every job-specific prompt (see
+# build_static_prefix), so Azure OpenAI prompt caching can reuse them.
+CV_WRITER_GUIDELINES = """You understand the Pydantic model requirements and ensure all data fits within specified constraints.
+
+Key guidelines:
+1. NEVER make up or fabricate specific metrics or statistics
+2. Focus on describing actual responsibilities and achievements without quantification
+3. Use clear, professional language to describe experience
+4. Maintain consistent formatting and style
+5. Ensure content is authentic and verifiable
+
+You understand the following constraints:
+- full_name: 1-50 characters (use full capacity)
+- job_title: 1-50 characters (use full capacity)
+- location: 1-50 characters (use full capacity)
+- email: valid email format
+- phone: 10-20 characters
+- linkedin: 1-100 characters (use full capacity)
+- professional_summary: 50-300 characters (aim for 250-300)
+- technical_skills: 1-5 items, each with:
+  - category: 1-30 characters (use 20-30)
+  - skills: 1-150 characters (aim for 100-150)
+- experience: 1-3 items, each with:
+  - job_title: 1-50 characters (use full capacity)
+  - company: 1-50 characters (use full capacity)
+  - date_range: 1-30 characters (use full capacity)
+  - responsibilities: 1-3 items, each 1-120 characters (aim for 100-120)
+- education: 1-2 items, each with:
+  - degree: 1-50 characters (use full capacity)
+  - institution: 1-50 characters (use full capacity)
+  - year: 4 characters
+  - achievements: 0-2 items, each 1-100 characters (aim for 80-100)
+- certifications: 0-5 items, each 1-40 characters (use 30-40)"""
+
+COVER_LETTER_WRITER_GUIDELINES = """Key guidelines:
+1. NEVER include fabricated metrics or statistics
+2. Focus on actual experience and skills
+3. Use specific examples without quantification
+4. Maintain professional and genuine tone
+5. Highlight relevant experience without exaggeration
+
+You understand the following constraints:
+- full_name: 1-50 characters
+- address: 1-100 characters
+- city: 1-50 characters
+- state: 2 characters
+- zip: 5-10 characters
+- email: valid email format
+- phone: 10-20 characters
+- date: valid date format
+- hiring_manager_name: 1-50 characters
+- job_title: 1-50 characters
+- company_name: 1-50 characters
+- company_address: 1-100 characters
+- company_city: 1-50 characters
+- company_state: 2 characters
+- company_zip: 5-10 characters
+- paragraphs: 3 items, each 50-800 characters
+- closing_paragraph: 20-300 characters"""
+
+def build_static_prefix(guidelines: str, base_document_path: Path, label: str) -> str:
+    """Role guidelines followed by a base document, identical for every job"""
+    with open(base_document_path, 'r') as file:
+        base_document = file.read()
+    return f"{guidelines.strip()}\n\n{label}:\n{base_document.strip()}\n"
+
+def cached_agent(build):
+    """Build an agent once per JobApplicationCrew and return the same instance afterwards"""
+    @functools.wraps(build)
+    def agent(self) -> Agent:
+        if build.__name__ not in self._agents:
+            self._agents[build.__name__] = build(self)
+        return self._agents[build.__name__]
+    return agent
+
 class JobApplicationCrew:
-    def __init__(self):
-        self.model = AzureCrewAILLM()
+    """
+    Agents, tools, tasks and crew are built once and reused for every job.
+    Only the job-specific inputs are swapped in at kickoff, so a long-lived
+    worker pays the setup cost once. A crew runs one job at a time; use one
+    JobApplicationCrew per concurrent worker.
+    """
+    ROLES = ('job_crawler', 'cv_writer', 'cover_letter_writer')
+
+    def __init__(self, llm=None):
+        static_prefixes = {
+            'cv_writer': build_static_prefix(
+                CV_WRITER_GUIDELINES, BASE_DIR / 'CV.txt', 'Base CV (CV.txt)'
+            ),
+            'cover_letter_writer': build_static_prefix(
+                COVER_LETTER_WRITER_GUIDELINES, BASE_DIR / 'cover_letter.txt', 'Base cover letter (cover_letter.txt)'
+            ),
+        }
+        # One LLM per role so each stage can use its own deployment and limits
+        self.models = {
+            role: llm or AzureCrewAILLM(role=role, static_prefix=static_prefixes.get(role))
+            for role in self.ROLES
+        }
+        # Tools hold no per-job state, so one instance of each is shared
+        self.read_file_tool = ReadTextFileTool()
+        self.webpage_tool = GetWebpageContentsTool()
+        self.render_tool = RenderAndSaveDocumentsTool()
+        self._agents = {}
+        self._tasks = None
+        self._crews = {}
         
+    @cached_agent
     def job_crawler(self) -> Agent:
         return Agent(
             role='Job Description Crawler',
@@ -208,114 +278,46 @@ class JobApplicationCrew:
             You focus on identifying essential requirements, qualifications, responsibilities, and company details.
             You also ensure proper formatting of company and job information for file organization.""",
             verbose=True,
-            tools=[GetWebpageContentsTool(), ReadTextFileTool()],
+            tools=[self.webpage_tool, self.read_file_tool],
             allow_delegation=False,
-            llm=self.model
+            llm=self.models['job_crawler']
         )
 
+    @cached_agent
     def cv_writer(self) -> Agent:
         return Agent(
             role='CV Writer',
             goal='Create a professional CV that matches job requirements while maintaining authenticity',
-            backstory="""You are an experienced CV writer who specializes in creating compelling CVs that match job requirements.
-            You understand the Pydantic model requirements and ensure all data fits within specified constraints.
-            
-            Key guidelines:
-            1. NEVER make up or fabricate specific metrics or statistics
-            2. Focus on describing actual responsibilities and achievements without quantification
-            3. Use clear, professional language to describe experience
-            4. Maintain consistent formatting and style
-            5. Ensure content is authentic and verifiable
-            
-            You understand the following constraints:
-            - full_name: 1-50 characters (use full capacity)
-            - job_title: 1-50 characters (use full capacity)
-            - location: 1-50 characters (use full capacity)
-            - email: valid email format
-            - phone: 10-20 characters
-            - linkedin: 1-100 characters (use full capacity)
-            - professional_summary: 50-300 characters (aim for 250-300)
-            - technical_skills: 1-5 items, each with:
-              - category: 1-30 characters (use 20-30)
-              - skills: 1-150 characters (aim for 100-150)
-            - experience: 1-3 items, each with:
-              - job_title: 1-50 characters (use full capacity)
-              - company: 1-50 characters (use full capacity)
-              - date_range: 1-30 characters (use full capacity)
-              - responsibilities: 1-3 items, each 1-120 characters (aim for 100-120)
-            - education: 1-2 items, each with:
-              - degree: 1-50 characters (use full capacity)
-              - institution: 1-50 characters (use full capacity)
-              - year: 4 characters
-              - achievements: 0-2 items, each 1-100 characters (aim for 80-100)
-            - certifications: 0-5 items, each 1-40 characters (use 30-40)""",
+            backstory="""You are an experienced CV writer who specializes in creating compelling CVs that match job requirements.""",
             verbose=True,
-            tools=[ReadTextFileTool()],
+            tools=[self.read_file_tool],
             allow_delegation=False,
-            llm=self.model
+            llm=self.models['cv_writer']
         )
 
+    @cached_agent
     def cover_letter_writer(self) -> Agent:
         return Agent(
             role='Cover Letter Writer',
             goal='Create authentic and compelling cover letters that highlight relevant qualifications',
             backstory="""You are a professional cover letter writer who creates engaging and relevant cover letters.
-            You understand the importance of authenticity and avoid making unsubstantiated claims.
-            
-            Key guidelines:
-            1. NEVER include fabricated metrics or statistics
-            2. Focus on actual experience and skills
-            3. Use specific examples without quantification
-            4. Maintain professional and genuine tone
-            5. Highlight relevant experience without exaggeration
-            
-            You understand the following constraints:
-            - full_name: 1-50 characters
-            - address: 1-100 characters
-            - city: 1-50 characters
-            - state: 2 characters
-            - zip: 5-10 characters
-            - email: valid email format
-            - phone: 10-20 characters
-            - date: valid date format
-            - hiring_manager_name: 1-50 characters
-            - job_title: 1-50 characters
-            - company_name: 1-50 characters
-            - company_address: 1-100 characters
-            - company_city: 1-50 characters
-            - company_state: 2 characters
-            - company_zip: 5-10 characters
-            - paragraphs: 3 items, each 50-800 characters
-            - closing_paragraph: 20-300 characters""",
+            You understand the importance of authenticity and avoid making unsubstantiated claims.""",
             verbose=True,
-            tools=[ReadTextFileTool()],
+            tools=[self.read_file_tool],
             allow_delegation=False,
-            llm=self.model
+            llm=self.models['cover_letter_writer']
         )
 
-    def document_processor(self) -> Agent:
-        return Agent(
-            role='Document Processor',
-            goal='Generate professionally formatted PDF and JPEG versions of the CV and cover letter',
-            backstory="""You are an expert at processing and formatting documents.
-            You ensure all documents are properly formatted and validate against the Pydantic models.
-            You focus on creating clean, professional layouts with consistent styling.
-            
-            Key responsibilities:
-            1. Ensure proper spacing and alignment
-            2. Maintain consistent font usage
-            3. Create clear visual hierarchy
-            4. Optimize readability
-            5. Generate high-quality output files""",
-            verbose=True,
-            tools=[RenderAndSaveDocumentsTool()],
-            allow_delegation=False,
-            llm=self.model
-        )
+    def create_tasks(self) -> dict:
+        """
+        Build one task per LLM stage, once. Job-specific content is filled in
+        at kickoff: {job_source} for extraction, {job_details} for the writers.
+        """
+        if self._tasks is not None:
+            return self._tasks
 
-    def create_tasks(self, job_url: str, output_dir: str) -> list:
         task_extract_job = Task(
-            description=f"""Extract key information from the job posting at {job_url}.
+            description="""Extract key information from {job_source}.
             Focus on required skills, qualifications, responsibilities, and company culture.
             Return the information in a structured format including:
             1. Job requirements and qualifications
@@ -328,137 +330,420 @@ class JobApplicationCrew:
 
         task_create_cv = Task(
             description="""Create a CV that matches the job requirements.
-            First, read the base CV from CV.txt using the read_text_file tool.
-            Then, modify the content to match the job requirements while following the Pydantic model structure.
+            Start from the base CV (CV.txt) provided in your instructions.
+            Modify the content to match the job requirements while following the Pydantic model structure.
             Ensure all content fits within the specified length constraints.
             CRITICAL: Return ONLY valid, complete JSON. Keep experience array to maximum 2 entries. Keep responsibilities to 2-3 items max.
-            Return the CV data in valid JSON format that matches the CV model.""",
+            Return the CV data in valid JSON format that matches the CV model.
+
+            Job information:
+            {job_details}""",
             expected_output="A complete, valid JSON string containing CV data. Must end with proper closing braces.",
-            agent=self.cv_writer(),
-            context=[task_extract_job]
+            agent=self.cv_writer()
         )
 
         task_create_cover_letter = Task(
         description="Create a cover letter that highlights relevant qualifications. \
-            First, read the base cover letter from cover_letter.txt using the read_text_file tool. \
-            Then, modify the content to match the job requirements while following the Pydantic model structure. \
+            Start from the base cover letter (cover_letter.txt) provided in your instructions. \
+            Modify the content to match the job requirements while following the Pydantic model structure. \
             Ensure all content fits within the specified length constraints. \
             CRITICAL: Return ONLY valid, complete JSON. Keep paragraphs array to exactly 3 entries. Ensure closing_paragraph is complete. \
-            Return the cover letter data in valid JSON format that matches the CoverLetter model.",
+            Return the cover letter data in valid JSON format that matches the CoverLetter model.\n\n\
+            Job information:\n{job_details}",
             expected_output="A JSON string containing cover letter data that matches the CoverLetter Pydantic model",
-            agent=self.cover_letter_writer(),
-            context=[task_extract_job]
+            agent=self.cover_letter_writer()
+        )
+
+        self._tasks = {
+            'extraction': task_extract_job,
+            'cv': task_create_cv,
+            'cover_letter': task_create_cover_letter
+        }
+        return self._tasks
+
+    def crew(self, stage: str) -> Crew:
+        """
+        Single-task crew for one stage, built once. Running the stages as
+        separate crews lets each one be checkpointed and skipped on resume.
+        """
+        if stage not in self._crews:
+            task = self.create_tasks()[stage]
+            self._crews[stage] = Crew(
+                agents=[task.agent],
+                tasks=[task],
+                verbose=True
+            )
+        return self._crews[stage]
+
+    def kickoff(self, stage: str, **inputs):
+        """Run one stage of the prebuilt crews and return its raw output"""
+        crew = self.crew(stage)
+        crew.kickoff(inputs=inputs)
+        return task_output(crew.tasks[0])
+
+_application_crew = None
+
+def get_application_crew() -> JobApplicationCrew:
+    """
+    Process-wide JobApplicationCrew, so repeated jobs reuse the same agents.
+    Only jobs within one process benefit, i.e. the jobs of a --batch run,
+    which is also how the server runs the extension's batches.
+    """
+    global _application_crew
+    if _application_crew is None:
+        _application_crew = JobApplicationCrew()
+    return _application_crew
+
+def task_output(task):
+    """Raw output of a finished task, whichever attribute this CrewAI version uses"""
+    if hasattr(task.output, 'raw'):
+        return task.output.raw
+    elif hasattr(task.output, 'result'):
+        return task.output.result
+    elif hasattr(task.output, 'json_dict'):
+        return task.output.json_dict
+    return str(task.output)
+
+def save_json(output_dir, name, data):
+    """Write one of the job's JSON outputs next to its artifacts"""
+    path = os.path.join(output_dir, name)
+    # Write then rename, so an interrupted run never leaves a torn checkpoint
+    with open(f"{path}.tmp", 'w') as file:
+        json.dump(data, file, indent=2, default=str)
+    os.replace(f"{path}.tmp", path)
+
+def load_json(output_dir, name):
+    """Read one of the job's JSON outputs, or None if it was not written yet"""
+    try:
+        with open(os.path.join(output_dir, name)) as file:
+            return json.load(file)
+    except (OSError, ValueError):
+        return None
+
+# Pipeline stages, each checkpointed to its own file in the job directory
+STAGES = ('extraction', 'cv', 'cover_letter', 'render')
+CHECKPOINTS = {
+    'extraction': 'job.json',
+    'cv': 'cv.json',
+    'cover_letter': 'cover_letter.json',
+    'render': 'render.json'
+}
+
+def describe_job_source(job: dict) -> str:
+    """What the extraction stage reads: a structured posting, or a URL to fetch"""
+    if job.get('description'):
+        return (
+            "the following job posting:\n\n"
+            f"Title: {job.get('title', '')}\n"
+            f"Company: {job.get('company', '')}\n"
+            f"Location: {job.get('location', '')}\n"
+            f"URL: {job.get('url', '')}\n\n"
+            f"Description:\n{job['description']}"
         )
+    return f"the job posting at {job['url']}"
 
-        return [task_extract_job, task_create_cv, task_create_cover_letter]
+def process_job(job: dict, output_dir: str, stop_after: str = None) -> dict:
+    """
+    Run the pipeline for one job with a checkpoint after every stage.
+
+    Each stage writes its result into output_dir (see CHECKPOINTS) as soon as
+    it completes, and stages whose checkpoint already exists are skipped. So an
+    interrupted or failed run resumes where it stopped, e.g. a render failure
+    never repeats the LLM stages. Raises on the first failing stage.
+    """
+    os.makedirs(output_dir, exist_ok=True)
+    application_crew = get_application_crew()
+    timings = load_json(output_dir, 'timings.json') or {}
+    result = {'output_dir': output_dir, 'stages_run': [], 'stages_resumed': []}
+
+    def run_stage(stage, build):
+        data = load_json(output_dir, CHECKPOINTS[stage])
+        if data is not None:
+            result['stages_resumed'].append(stage)
+            return data
+        print(f"\n▶️  Stage: {stage}")
+        started = time.perf_counter()
+        metrics_before = get_role_metrics()
+        data = build()
+        timings[f'{stage}_seconds'] = round(time.perf_counter() - started, 3)
+        # Per-role LLM latency and tokens of this job, kept with its timings
+        merge_role_metrics(timings.setdefault('roles', {}), get_role_metrics(since=metrics_before))
+        save_json(output_dir, CHECKPOINTS[stage], data)
+        save_json(output_dir, 'timings.json', timings)
+        result['stages_run'].append(stage)
+        return data
+
+    def extract():
+        output = application_crew.kickoff('extraction', job_source=describe_job_source(job))
+        try:
+            return extract_json(output)
+        except ValueError:
+            return {'raw': str(output)}
+
+    job_details = run_stage('extraction', extract)
+    result['timings'] = timings
+    if stop_after == 'extraction':
+        return result
+
+    job_details_text = json.dumps(job_details, indent=2)
+
+    def write(stage, model_class):
+        def build():
+            output = application_crew.kickoff(stage, job_details=job_details_text)
+            # Locate the JSON object in the output, closing it if truncated,
+            # and only checkpoint data that passes model validation
+            data = extract_json(output, required_keys=model_class.model_fields.keys(),
+                                validate=model_class.model_validate)
+            return model_class(**data).model_dump(mode='json')
+        return build
+
+    cv_data = run_stage('cv', write('cv', CV))
+    if stop_after == 'cv':
+        return result
+    cl_data = run_stage('cover_letter', write('cover_letter', CoverLetter))
+    if stop_after == 'cover_letter':
+        return result
+
+    def render():
+        render_info = json.loads(application_crew.render_tool._run(cv_data, cl_data, output_dir))
+        if not render_info.get("success"):
+            raise RuntimeError(f"Rendering failed: {render_info.get('error')}")
+        cv_fit = render_info.get('fit', {}).get('cv', {})
+        if cv_fit.get('trimmed'):
+            # Keep cv.json in line with what was actually rendered
+            save_json(output_dir, 'cv.json', cv_fit['data'])
+        return render_info
+
+    # Rendered files may have been removed since the checkpoint was written
+    render_info = load_json(output_dir, CHECKPOINTS['render'])
+    if render_info and not all(os.path.isfile(path) for path in render_info['files'].values()):
+        os.remove(os.path.join(output_dir, CHECKPOINTS['render']))
+    render_info = run_stage('render', render)
+    result['files'] = render_info['files']
+    result['render'] = render_info
+    return result
+
+def regenerate_fragment(output_dir: str, request: dict) -> dict:
+    """
+    Regenerate part of a finished job from its checkpoints.
+
+    request names a "document" ("cv" or "cover_letter") and optionally:
+    "overrides" (top-level fields set directly, no LLM), "paragraph" (index
+    into CoverLetter.paragraphs) or "experience" (index into CV.experience),
+    plus free-text "instructions". A paragraph or experience item is
+    rewritten with a single LLM call to the document's writer; with neither
+    and no overrides, the whole document's writer stage runs again. The
+    extracted job and the other document are reused as they are, and the
+    untouched document comes out of the render cache.
+    """
+    job_details = load_json(output_dir, CHECKPOINTS['extraction'])
+    cv_data = load_json(output_dir, CHECKPOINTS['cv'])
+    cl_data = load_json(output_dir, CHECKPOINTS['cover_letter'])
+    if job_details is None or cv_data is None or cl_data is None:
+        raise ValueError(f"{output_dir} has no completed extraction and writer checkpoints")
+
+    document = request.get('document')
+    if document not in ('cv', 'cover_letter'):
+        raise ValueError('document must be "cv" or "cover_letter"')
+    model_class = CV if document == 'cv' else CoverLetter
+    data = cv_data if document == 'cv' else cl_data
+    application_crew = get_application_crew()
+    job_details_text = json.dumps(job_details, indent=2)
+    instructions = (request.get('instructions') or '').strip()
+    started = time.perf_counter()
+    metrics_before = get_role_metrics()
+
+    if 'paragraph' in request and 'experience' in request:
+        raise ValueError('Send either paragraph or experience, not both')
+    overrides = request.get('overrides') or {}
+    for field, value in overrides.items():
+        if field not in model_class.model_fields or isinstance(data.get(field), (list, dict)):
+            raise ValueError(f"{field} cannot be overridden on {document}")
+        data[field] = value
+
+    def ask(role, prompt):
+        # Straight to the role's LLM: its static prefix still leads the prompt
+        return application_crew.models[role].call([{"role": "user", "content": prompt}])
+
+    if 'paragraph' in request:
+        if document != 'cover_letter':
+            raise ValueError('paragraph applies to the cover_letter document')
+        index = int(request['paragraph'])
+        if not 0 <= index < len(data['paragraphs']):
+            raise ValueError(f"paragraph must be between 0 and {len(data['paragraphs']) - 1}")
+        text = ask('cover_letter_writer', f"""Rewrite paragraph {index + 1} of this cover letter for the job below.
+Keep the other paragraphs in mind so the letter still reads as a whole.
+
+Job information:
+{job_details_text}
+
+Current cover letter:
+{json.dumps(data, indent=2)}
+
+{f"Instructions: {instructions}" if instructions else ""}
+Return ONLY the new paragraph text (50-800 characters), without quotes or commentary.""")
+        data['paragraphs'][index] = text.strip().strip('"').strip()
+    elif 'experience' in request:
+        if document != 'cv':
+            raise ValueError('experience applies to the cv document')
+        index = int(request['experience'])
+        if not 0 <= index < len(data['experience']):
+            raise ValueError(f"experience must be between 0 and {len(data['experience']) - 1}")
+        output = ask('cv_writer', f"""Rewrite experience entry {index + 1} of this CV for the job below.
+
+Job information:
+{job_details_text}
+
+Current experience entry:
+{json.dumps(data['experience'][index], indent=2)}
+
+{f"Instructions: {instructions}" if instructions else ""}
+Return ONLY a JSON object with job_title, company, date_range and responsibilities
+(1-3 items, each at most 120 characters), following the CV constraints.""")
+        data['experience'][index] = extract_json(output, required_keys=Experience.model_fields.keys(),
+                                                 validate=Experience.model_validate)
+    elif not overrides:
+        if instructions:
+            job_details_text += f"\n\nAdditional instructions: {instructions}"
+        output = application_crew.kickoff(document, job_details=job_details_text)
+        data = extract_json(output, required_keys=model_class.model_fields.keys(),
+                            validate=model_class.model_validate)
+
+    data = model_class(**data).model_dump(mode='json')
+    save_json(output_dir, CHECKPOINTS[document], data)
+    if document == 'cv':
+        cv_data = data
+    else:
+        cl_data = data
+
+    render_info = json.loads(application_crew.render_tool._run(cv_data, cl_data, output_dir))
+    if not render_info.get("success"):
+        raise RuntimeError(f"Rendering failed: {render_info.get('error')}")
+    if render_info.get('fit', {}).get('cv', {}).get('trimmed'):
+        save_json(output_dir, CHECKPOINTS['cv'], render_info['fit']['cv']['data'])
+    save_json(output_dir, CHECKPOINTS['render'], render_info)
+
+    timings = load_json(output_dir, 'timings.json') or {}
+    merge_role_metrics(timings.setdefault('roles', {}), get_role_metrics(since=metrics_before))
+    save_json(output_dir, 'timings.json', timings)
+
+    return {
+        'output_dir': output_dir,
+        'document': document,
+        'seconds': round(time.perf_counter() - started, 3),
+        'render': render_info
+    }
+
+def print_render_info(render_info):
+    """Summarize where the documents went and what the renderer did"""
+    print("\n✅ Documents rendered successfully!")
+    print(f"   📄 CV PDF: {render_info['files']['cv_pdf']}")
+    print(f"   📄 CV JPEG: {render_info['files']['cv_jpg']}")
+    print(f"   📄 Cover Letter PDF: {render_info['files']['cover_letter_pdf']}")
+    print(f"   📄 Cover Letter JPEG: {render_info['files']['cover_letter_jpg']}")
+    memory = render_info.get('memory', {})
+    if memory:
+        if 'render_peak_rss_mb' in memory:
+            print(f"   🧠 Render peak RSS: {memory['render_peak_rss_mb']} MB")
+        else:
+            print(f"   🧠 Process peak RSS: {memory['process_peak_rss_mb']} MB")
+    cv_fit = render_info.get('fit', {}).get('cv', {})
+    if cv_fit.get('trimmed'):
+        print(f"   ✂️  CV fitted from {cv_fit['pages']} to {cv_fit['fitted_pages']} page(s), "
+              f"trimmed: {', '.join(step['item'] for step in cv_fit['trimmed'])}")
+    cached = [doc for doc, hit in render_info.get('cached', {}).items() if hit]
+    if cached:
+        print(f"   ♻️  Reused from render cache: {', '.join(cached)}")
+
+def print_role_metrics():
+    print("\n⏱️  LLM latency by role:")
+    for role, metrics in get_role_metrics().items():
+        print(f"   {role}: {metrics['calls']} calls, {metrics['avg_seconds']:.1f}s avg, "
+              f"{metrics['prompt_tokens']} prompt ({metrics['cached_prompt_tokens']} cached) / "
+              f"{metrics['completion_tokens']} completion tokens")
+
+def run_batch(batch_path, results_path, output_root, stop_after=None):
+    """
+    Process every job of a JSONL file. Each line is a URL string, {"url": ...} or a
+    structured posting ({"title", "company", "location", "description", ...}),
+    optionally with an "id". One result line is appended to results_path as
+    each job completes. Re-running the same file resumes from the checkpoints
+    under output_root. Returns the number of failed jobs.
+    """
+    failures = 0
+    with open(batch_path) as batch, open(results_path, 'a') as results:
+        for line_number, line in enumerate(batch, 1):
+            if not line.strip():
+                continue
+            try:
+                job, job_id = parse_batch_line(line, line_number)
+            except ValueError as e:
+                job, job_id = {}, f"line-{line_number}"
+                outcome = {'status': 'error', 'error': str(e)}
+            else:
+                print(f"\n{'='*80}\n🚀 Job {job_id}: {job.get('title') or job.get('url', '')}\n{'='*80}")
+                try:
+                    outcome = process_job(job, os.path.join(output_root, job_id), stop_after)
+                    outcome['status'] = 'done' if stop_after is None else f'stopped_after_{stop_after}'
+                except Exception as e:
+                    outcome = {'status': 'error', 'error': str(e)}
+                    print(f"\n❌ Job {job_id} failed: {e}")
+
+            if outcome['status'] == 'error':
+                failures += 1
+            results.write(json.dumps({'id': job_id, 'url': job.get('url', ''), **outcome}, default=str) + '\n')
+            results.flush()
+
+    print_role_metrics()
+    return failures
 
 def main():
+    parser = argparse.ArgumentParser(description="Generate a tailored CV and cover letter for job postings")
+    parser.add_argument('--batch', metavar='JOBS_JSONL',
+                        help="process every job in a JSONL file instead of prompting for a URL")
+    parser.add_argument('--results', metavar='RESULTS_JSONL',
+                        help="where to append one result line per job (default: <JOBS_JSONL>.results.jsonl)")
+    parser.add_argument('--output-root', default=os.path.join('output', 'jobs'),
+                        help="directory holding one checkpoint/output directory per job")
+    parser.add_argument('--stop-after', choices=STAGES,
+                        help="stop each job after this stage")
+    parser.add_argument('--regenerate', metavar='JOB_DIR',
+                        help="regenerate part of a finished job (see --request)")
+    parser.add_argument('--request', default='{}',
+                        help='JSON regeneration request, e.g. {"document": "cover_letter", "paragraph": 1}')
+    args = parser.parse_args()
+
+    if args.regenerate:
+        try:
+            result = regenerate_fragment(args.regenerate, json.loads(args.request))
+        except Exception as e:
+            print(f"\n❌ Regeneration failed: {e}")
+            sys.exit(1)
+        print_render_info(result['render'])
+        print(f"\n✅ Regenerated {result['document']} in {result['seconds']}s")
+        return
+
+    if args.batch:
+        results_path = args.results or f"{os.path.splitext(args.batch)[0]}.results.jsonl"
+        failures = run_batch(args.batch, results_path, args.output_root, args.stop_after)
+        print(f"\n📝 Results written to {results_path}")
+        sys.exit(1 if failures else 0)
+
     # Get job URL from user
     job_url = input("\nPlease enter the job posting URL: ").strip()
     
-    # Set up output directory
-    output_dir = "output"
-    os.makedirs(output_dir, exist_ok=True)
+    # Each job gets its own directory, which doubles as its checkpoint
+    output_dir = os.getenv("JOB_OUTPUT_DIR") or os.path.join(args.output_root, job_id_for({'url': job_url}))
     
     print("\nStarting job application process...")
     print(f"Job URL: {job_url}")
     print(f"Output Directory: {output_dir}")
-    
-    # Initialize the crew
-    application_crew = JobApplicationCrew()
-    
-    # Create initial tasks
-    initial_tasks = application_crew.create_tasks(job_url, output_dir)
-
-    # Create and run the crew
-    crew = Crew(
-        agents=[
-            application_crew.job_crawler(),
-            application_crew.cv_writer(),
-            application_crew.cover_letter_writer(),
-            application_crew.document_processor()
-        ],
-        tasks=initial_tasks,
-        verbose=True
-    )
 
     try:
-        # Run document creation
-        result = crew.kickoff()
-        print("\n✅ Crew execution completed!")
-        print("\n📄 Generated Data:")
-        print(result)
-        print("\n" + "="*80)
-        print("✅ SUCCESS: CV and Cover Letter data generated with Azure AD authentication!")
-        print("="*80)
-        
-        # Now render the documents using the tool
-        print("\n🎨 Rendering PDF and JPEG documents...")
-        try:
-            # Get the task outputs - try different methods to extract JSON
-            cv_task = crew.tasks[1]
-            cl_task = crew.tasks[2]
-            
-            # Try to get raw output
-            if hasattr(cv_task.output, 'raw'):
-                cv_output = cv_task.output.raw
-            elif hasattr(cv_task.output, 'result'):
-                cv_output = cv_task.output.result
-            elif hasattr(cv_task.output, 'json_dict'):
-                cv_output = cv_task.output.json_dict
-            else:
-                cv_output = str(cv_task.output)
-            
-            if hasattr(cl_task.output, 'raw'):
-                cl_output = cl_task.output.raw
-            elif hasattr(cl_task.output, 'result'):
-                cl_output = cl_task.output.result
-            elif hasattr(cl_task.output, 'json_dict'):
-                cl_output = cl_task.output.json_dict
-            else:
-                cl_output = str(cl_task.output)
-            
-            # Parse JSON more carefully
-            import re
-            
-            # If it's a string, try to extract JSON from it
-            if isinstance(cv_output, str):
-                # Try to find JSON object in the string
-                json_match = re.search(r'\{[\s\S]*\}', cv_output)
-                if json_match:
-                    cv_output = json_match.group(0)
-                cv_data = json.loads(cv_output)
-            else:
-                cv_data = cv_output
-                
-            if isinstance(cl_output, str):
-                # Try to find JSON object in the string
-                json_match = re.search(r'\{[\s\S]*\}', cl_output)
-                if json_match:
-                    cl_output = json_match.group(0)
-                cl_data = json.loads(cl_output)
-            else:
-                cl_data = cl_output
-            
-            # Render documents
-            render_tool = RenderAndSaveDocumentsTool()
-            render_result = render_tool._run(cv_data, cl_data, output_dir)
-            
-            render_info = json.loads(render_result)
-            if render_info.get("success"):
-                print("\n✅ Documents rendered successfully!")
-                print(f"   📄 CV PDF: {render_info['files']['cv_pdf']}")
-                print(f"   📄 CV JPEG: {render_info['files']['cv_jpg']}")
-                print(f"   📄 Cover Letter PDF: {render_info['files']['cover_letter_pdf']}")
-                print(f"   📄 Cover Letter JPEG: {render_info['files']['cover_letter_jpg']}")
-            else:
-                print(f"\n⚠️ Rendering failed: {render_info.get('error')}")
-                
-        except Exception as render_error:
-            print(f"\n⚠️ Could not render documents: {render_error}")
-            print("    JSON data was successfully generated, but PDF/JPEG rendering failed.")
-            import traceback
-            traceback.print_exc()
+        result = process_job({'url': job_url}, output_dir, args.stop_after)
+        if 'render' in result:
+            print_render_info(result['render'])
+        print_role_metrics()
         
         print("\n" + "="*80)
         print("✅ SUCCESS: Documents generated!")
@@ -466,6 +751,7 @@ def main():
         
     except Exception as e:
         print(f"\n❌ Error during execution: {str(e)}")
+        print("    Completed stages are checkpointed; run again with the same output directory to resume.")
 
 if __name__ == "__main__":
-    main() 
\ No newline at end of file
+    main()
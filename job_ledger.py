@@ -0,0 +1,274 @@
+"""
+SQLite ledger of processed job postings, with full-text search, and the
+identity of a job (posting hash, batch job id)
+"""
+
+import hashlib
+import json
+import os
+import re
+import sqlite3
+import threading
+from datetime import datetime
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+LEDGER_PATH = os.getenv("JOB_LEDGER_PATH", os.path.join(BASE_DIR, "output", "jobs.db"))
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    id TEXT PRIMARY KEY,
+    posting_hash TEXT NOT NULL,
+    inputs_hash TEXT NOT NULL DEFAULT '',
+    status TEXT NOT NULL,
+    created_at TEXT NOT NULL,
+    updated_at TEXT NOT NULL,
+    title TEXT NOT NULL DEFAULT '',
+    company TEXT NOT NULL DEFAULT '',
+    location TEXT NOT NULL DEFAULT '',
+    url TEXT NOT NULL DEFAULT '',
+    description TEXT NOT NULL DEFAULT '',
+    job_json TEXT,
+    cv_json TEXT,
+    cover_letter_json TEXT,
+    timings_json TEXT,
+    artifacts_json TEXT,
+    error TEXT
+);
+CREATE INDEX IF NOT EXISTS jobs_posting_hash ON jobs (posting_hash, status);
+CREATE INDEX IF NOT EXISTS jobs_created_at ON jobs (created_at);
+
+CREATE VIRTUAL TABLE IF NOT EXISTS jobs_fts USING fts5 (
+    title, company, location, description,
+    content='jobs', content_rowid='rowid'
+);
+
+CREATE TRIGGER IF NOT EXISTS jobs_fts_insert AFTER INSERT ON jobs BEGIN
+    INSERT INTO jobs_fts (rowid, title, company, location, description)
+    VALUES (new.rowid, new.title, new.company, new.location, new.description);
+END;
+CREATE TRIGGER IF NOT EXISTS jobs_fts_delete AFTER DELETE ON jobs BEGIN
+    INSERT INTO jobs_fts (jobs_fts, rowid, title, company, location, description)
+    VALUES ('delete', old.rowid, old.title, old.company, old.location, old.description);
+END;
+CREATE TRIGGER IF NOT EXISTS jobs_fts_update AFTER UPDATE OF title, company, location, description ON jobs BEGIN
+    INSERT INTO jobs_fts (jobs_fts, rowid, title, company, location, description)
+    VALUES ('delete', old.rowid, old.title, old.company, old.location, old.description);
+    INSERT INTO jobs_fts (rowid, title, company, location, description)
+    VALUES (new.rowid, new.title, new.company, new.location, new.description);
+END;
+"""
+
+# Columns holding JSON documents, keyed by the field name used in the API
+JSON_COLUMNS = {
+    'job': 'job_json',
+    'cv': 'cv_json',
+    'cover_letter': 'cover_letter_json',
+    'timings': 'timings_json',
+    'artifacts': 'artifacts_json',
+}
+UPDATABLE_COLUMNS = {'status', 'error', 'title', 'company', 'location', 'url', 'description'}
+SUMMARY_COLUMNS = 'id, status, created_at, updated_at, title, company, location, url'
+
+# Job ids name directories under the output root
+JOB_ID_PATTERN = re.compile(r'^[A-Za-z0-9_-]+$')
+
+def posting_hash(job_data):
+    """Identity of a posting: its URL plus description"""
+    digest = hashlib.sha256()
+    digest.update((job_data.get('url') or '').encode('utf-8'))
+    digest.update(b'\0')
+    digest.update((job_data.get('description') or '').strip().encode('utf-8'))
+    return digest.hexdigest()
+
+def inputs_hash(paths):
+    """
+    Identity of everything besides the posting that shapes the documents,
+    e.g. the base CV, prompts and templates: a hash of the files' contents
+    """
+    digest = hashlib.sha256()
+    for path in sorted(str(path) for path in paths):
+        digest.update(os.path.basename(path).encode('utf-8'))
+        digest.update(b'\0')
+        try:
+            with open(path, 'rb') as f:
+                digest.update(f.read())
+        except OSError:
+            pass
+        digest.update(b'\0')
+    return digest.hexdigest()
+
+def job_id_for(job):
+    """Stable id of a batch job: its own "id", or a hash of the posting"""
+    if job.get('id') in (None, ''):
+        return posting_hash(job)[:12]
+    job_id = str(job['id'])
+    if not JOB_ID_PATTERN.match(job_id):
+        raise ValueError(f"Invalid job id {job_id!r}: use letters, digits, '_' and '-' only")
+    return job_id
+
+def parse_batch_line(line, line_number):
+    """
+    Job of one batch JSONL line, as (job, job_id): an object, or a bare
+    string taken as the job URL. Raises ValueError for anything else.
+    """
+    try:
+        job = json.loads(line)
+    except json.JSONDecodeError as e:
+        raise ValueError(f"Invalid JSON on line {line_number}: {e}")
+    if isinstance(job, str):
+        job = {'url': job}
+    if not isinstance(job, dict):
+        raise ValueError(f"Line {line_number} is not a job object or URL string")
+    return job, job_id_for(job)
+
+def fts_query(text):
+    """Quote each search term (FTS5 syntax is not exposed) and prefix-match it"""
+    terms = [term.replace('"', '""') for term in text.split()]
+    return ' '.join(f'"{term}"*' for term in terms)
+
+class JobLedger:
+    """
+    Records every posting with its extracted job data, generated CV and
+    cover letter, timings and artifact paths. Uses WAL mode so the server's
+    request threads can read while a job is being written, with one
+    connection per thread.
+    """
+    def __init__(self, path=LEDGER_PATH):
+        self.path = path
+        self._local = threading.local()
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        connection = self._connect()
+        connection.executescript(SCHEMA)
+        # Ledgers created before inputs_hash existed
+        columns = {row['name'] for row in connection.execute('PRAGMA table_info(jobs)')}
+        if 'inputs_hash' not in columns:
+            connection.execute("ALTER TABLE jobs ADD COLUMN inputs_hash TEXT NOT NULL DEFAULT ''")
+            connection.commit()
+
+    def _connect(self):
+        connection = getattr(self._local, 'connection', None)
+        if connection is None:
+            connection = sqlite3.connect(self.path, timeout=30)
+            connection.row_factory = sqlite3.Row
+            connection.execute('PRAGMA journal_mode=WAL')
+            connection.execute('PRAGMA synchronous=NORMAL')
+            self._local.connection = connection
+        return connection
+
+    def record_posting(self, job_id, job_data, inputs_hash='', status='processing'):
+        """Insert a newly received posting, with the inputs_hash it is generated from"""
+        now = datetime.now().isoformat()
+        with self._connect() as connection:
+            connection.execute(
+                """INSERT INTO jobs (id, posting_hash, inputs_hash, status, created_at, updated_at,
+                                     title, company, location, url, description)
+                   VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)""",
+                (
+                    job_id, posting_hash(job_data), inputs_hash, status, now, now,
+                    job_data.get('title') or '', job_data.get('company') or '',
+                    job_data.get('location') or '', job_data.get('url') or '',
+                    job_data.get('description') or '',
+                )
+            )
+
+    def update_job(self, job_id, **fields):
+        """Update plain columns and JSON documents (job, cv, cover_letter, timings, artifacts)"""
+        assignments = ['updated_at = ?']
+        values = [datetime.now().isoformat()]
+        for name, value in fields.items():
+            if name in JSON_COLUMNS:
+                assignments.append(f'{JSON_COLUMNS[name]} = ?')
+                values.append(None if value is None else json.dumps(value))
+            elif name in UPDATABLE_COLUMNS:
+                assignments.append(f'{name} = ?')
+                values.append(value)
+            else:
+                raise ValueError(f"Unknown ledger field: {name}")
+        values.append(job_id)
+        with self._connect() as connection:
+            connection.execute(f"UPDATE jobs SET {', '.join(assignments)} WHERE id = ?", values)
+
+    def get_job(self, job_id):
+        """Full record of a job, with JSON documents decoded, or None"""
+        row = self._connect().execute('SELECT * FROM jobs WHERE id = ?', (job_id,)).fetchone()
+        return self._decode(row) if row else None
+
+    def find_completed(self, job_data, inputs_hash):
+        """
+        Most recent successfully processed job for the same posting, generated
+        from the same inputs, or None
+        """
+        row = self._connect().execute(
+            """SELECT * FROM jobs WHERE posting_hash = ? AND inputs_hash = ? AND status = 'done'
+               ORDER BY created_at DESC LIMIT 1""",
+            (posting_hash(job_data), inputs_hash)
+        ).fetchone()
+        return self._decode(row) if row else None
+
+    def fail_interrupted(self):
+        """
+        Mark jobs left processing by a server that stopped mid-run as failed,
+        so resume_failed can pick up their checkpoints. Call at server start.
+        Returns the number of jobs marked.
+        """
+        with self._connect() as connection:
+            return connection.execute(
+                """UPDATE jobs SET status = 'error', error = 'Interrupted before it finished', updated_at = ?
+                   WHERE status = 'processing'""",
+                (datetime.now().isoformat(),)
+            ).rowcount
+
+    def resume_failed(self, job_data, inputs_hash):
+        """
+        Take over the most recent failed job for the same posting and inputs,
+        marking it processing again so its checkpoints can be resumed.
+        Returns its id, or None if there is none.
+        """
+        connection = self._connect()
+        row = connection.execute(
+            """SELECT id FROM jobs WHERE posting_hash = ? AND inputs_hash = ? AND status = 'error'
+               ORDER BY created_at DESC LIMIT 1""",
+            (posting_hash(job_data), inputs_hash)
+        ).fetchone()
+        if row is None:
+            return None
+        with connection:
+            # Only one concurrent submission gets to resume it
+            claimed = connection.execute(
+                """UPDATE jobs SET status = 'processing', error = NULL, updated_at = ?
+                   WHERE id = ? AND status = 'error'""",
+                (datetime.now().isoformat(), row['id'])
+            ).rowcount
+        return row['id'] if claimed else None
+
+    def list_jobs(self, limit=50, offset=0):
+        """Processing history, newest first"""
+        rows = self._connect().execute(
+            f'SELECT {SUMMARY_COLUMNS} FROM jobs ORDER BY created_at DESC LIMIT ? OFFSET ?',
+            (limit, offset)
+        ).fetchall()
+        return [dict(row) for row in rows]
+
+    def search(self, text, limit=20):
+        """Full-text search over title, company, location and description"""
+        query = fts_query(text)
+        if not query:
+            return []
+        summary = ', '.join(f'jobs.{column.strip()}' for column in SUMMARY_COLUMNS.split(','))
+        rows = self._connect().execute(
+            f"""SELECT {summary},
+                       snippet(jobs_fts, 3, '[', ']', '…', 12) AS snippet
+                FROM jobs_fts JOIN jobs ON jobs.rowid = jobs_fts.rowid
+                WHERE jobs_fts MATCH ?
+                ORDER BY bm25(jobs_fts)
+                LIMIT ?""",
+            (query, limit)
+        ).fetchall()
+        return [dict(row) for row in rows]
+
+    def _decode(self, row):
+        record = dict(row)
+        for name, column in JSON_COLUMNS.items():
+            value = record.pop(column)
+            record[name] = json.loads(value) if value else None
+        return record
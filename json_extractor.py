@@ -0,0 +1,185 @@
+"""
+Locate and repair JSON objects embedded in LLM task output
+"""
+
+import json
+
+OPENERS = {'{': '}', '[': ']'}
+CLOSERS = {'}': '{', ']': '['}
+MAX_REPAIR_ATTEMPTS = 64
+MAX_RESTARTS = 8
+
+def _scan(text):
+    """
+    Single pass over text that tracks strings, escapes and nesting.
+
+    Returns (complete, partial): complete is a list of (start, end) spans of
+    balanced top-level objects, partial describes an object that was still
+    open when the text ended (or None). Commas seen inside the open object are
+    recorded with the nesting stack at that point, so a truncated object can
+    be cut back to its last complete member.
+    """
+    complete = []
+    stack = []
+    start = None
+    commas = []
+    in_string = False
+    escaped = False
+
+    for i, ch in enumerate(text):
+        if in_string:
+            if escaped:
+                escaped = False
+            elif ch == '\\':
+                escaped = True
+            elif ch == '"':
+                in_string = False
+            continue
+
+        if not stack:
+            # Outside any object: only an opening brace starts a candidate
+            if ch == '{':
+                stack.append(ch)
+                start = i
+                commas = []
+            continue
+
+        if ch == '"':
+            in_string = True
+        elif ch in OPENERS:
+            stack.append(ch)
+        elif ch in CLOSERS:
+            if stack[-1] != CLOSERS[ch]:
+                # Mismatched bracket: drop this candidate and rescan after it
+                stack = []
+                continue
+            stack.pop()
+            if not stack:
+                complete.append((start, i + 1))
+        elif ch == ',':
+            commas.append((i, tuple(stack)))
+
+    partial = None
+    if stack:
+        partial = {
+            'start': start,
+            'stack': tuple(stack),
+            'in_string': in_string,
+            'escaped': escaped,
+            'commas': commas,
+        }
+    return complete, partial
+
+def _closing(stack):
+    return ''.join(OPENERS[opener] for opener in reversed(stack))
+
+def _drops_whole_elements(stack):
+    """
+    Whether closing these open containers completes only the root object and
+    arrays. Closing an object nested deeper (e.g. an experience entry) would
+    keep it half-written, so such cuts are tried later.
+    """
+    return '{' not in stack[1:]
+
+def _valid(value, validate):
+    if validate is None:
+        return True
+    try:
+        validate(value)
+    except Exception:
+        return False
+    return True
+
+def _repair(text, partial, validate=None):
+    """
+    Close a truncated object, backing off to earlier members if needed.
+
+    Cuts that drop an unfinished array element as a whole come first, then
+    the remaining cuts, latest first. A string cut off mid-way is half a
+    sentence, so it is only closed as a last resort. The first attempt that
+    passes validate wins; without a passing one, the first that parses.
+    """
+    fragment = text[partial['start']:]
+    cuts = []
+
+    if not partial['in_string']:
+        cuts.append((fragment.rstrip().rstrip(','), partial['stack']))
+
+    for index, stack in reversed(partial['commas'][-MAX_REPAIR_ATTEMPTS:]):
+        cuts.append((text[partial['start']:index], stack))
+
+    attempts = [prefix + _closing(stack) for prefix, stack in cuts if _drops_whole_elements(stack)]
+    attempts += [prefix + _closing(stack) for prefix, stack in cuts if not _drops_whole_elements(stack)]
+
+    if partial['in_string']:
+        tail = fragment[:-1] if partial['escaped'] else fragment
+        attempts.append(tail + '"' + _closing(partial['stack']))
+
+    fallback = None
+    for attempt in attempts:
+        try:
+            value = json.loads(attempt)
+        except json.JSONDecodeError:
+            continue
+        if not isinstance(value, dict):
+            continue
+        if _valid(value, validate):
+            return value
+        if fallback is None:
+            fallback = value
+    return fallback
+
+def _score(value, required_keys):
+    return sum(1 for key in required_keys if key in value)
+
+def extract_json(text, required_keys=(), repair=True, validate=None, _restarts=0):
+    """
+    Extract the JSON object from LLM output.
+
+    Every balanced top-level object in text is considered; the one containing
+    the most of required_keys wins, with ties going to the largest object.
+    If no complete object parses and repair is enabled, an object cut off at
+    the end of the text (e.g. by max_tokens) has its open strings, objects and
+    arrays closed. validate (e.g. CV.model_validate) is called on candidates,
+    and ones it raises for are only used when nothing passes. Raises
+    ValueError when nothing usable is found.
+    """
+    if isinstance(text, dict):
+        return text
+
+    text = str(text)
+    complete, partial = _scan(text)
+
+    ranked = []
+    for start, end in complete:
+        try:
+            value = json.loads(text[start:end])
+        except json.JSONDecodeError:
+            continue
+        ranked.append(((_score(value, required_keys), end - start), value))
+    ranked.sort(key=lambda item: item[0], reverse=True)
+    candidates = [value for _, value in ranked]
+    best = next((value for value in candidates if _valid(value, validate)),
+                candidates[0] if candidates else None)
+
+    def quality(value):
+        return (_valid(value, validate), _score(value, required_keys))
+
+    if best is not None and quality(best)[0] and (
+            not partial or _score(best, required_keys) == len(required_keys)):
+        return best
+
+    if repair and partial:
+        repaired = _repair(text, partial, validate)
+        if repaired is not None and (best is None or quality(repaired) > quality(best)):
+            return repaired
+
+    if best is not None:
+        return best
+
+    # A stray "{" in prose can swallow the real object; retry just past it
+    if partial and _restarts < MAX_RESTARTS:
+        return extract_json(
+            text[partial['start'] + 1:], required_keys, repair, validate, _restarts + 1
+        )
+    raise ValueError("No JSON object found in output")
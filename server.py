@@ -3,16 +3,79 @@
 Local server to receive job data from browser extension and process with CrewAI
 """
 
-from flask import Flask, request, jsonify
+from flask import Flask, request, jsonify, send_file, abort, Response, stream_with_context
 from flask_cors import CORS
 import json
 import os
-from pathlib import Path
+import re
+import shutil
 import subprocess
 import tempfile
+import threading
+import uuid
+import hashlib
+import zipfile
+import time
+import glob
+import queue
+from datetime import datetime
+from pydantic import ValidationError
+from job_ledger import JobLedger, posting_hash, inputs_hash
+from models import CV, CoverLetter
+
+# Only the browser extension may read responses; job records hold personal data
+CORS_ORIGINS = [
+    origin.strip()
+    for origin in os.getenv('CORS_ORIGINS', r'chrome-extension://.*,moz-extension://.*').split(',')
+    if origin.strip()
+]
+SERVER_HOST = os.getenv('SERVER_HOST', '127.0.0.1')
 
 app = Flask(__name__)
-CORS(app)  # Allow requests from browser extension
+CORS(app, origins=CORS_ORIGINS)  # Allow requests from browser extension
+# Behind nginx/Apache, let the front server send artifact files itself
+app.config['USE_X_SENDFILE'] = os.getenv('USE_X_SENDFILE', '').lower() in ('1', 'true', 'yes')
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+JOBS_OUTPUT_DIR = os.path.join(BASE_DIR, 'output', 'jobs')
+JOB_ID_PATTERN = re.compile(r'^[0-9a-f]{12}$')
+ARTIFACT_NAMES = ('cv.pdf', 'cv.jpg', 'cover_letter.pdf', 'cover_letter.jpg')
+ZIP_CHUNK_SIZE = 256 * 1024
+# Files besides the posting that shape the generated documents: base
+# documents, prompts and guidelines, models and templates
+GENERATION_INPUTS = ('CV.txt', 'cover_letter.txt', 'job_application_agents.py', 'models.py', 'templates/*.html')
+
+# Every processed posting is recorded here. Runs still marked processing
+# belong to a previous server process and will never finish.
+ledger = JobLedger()
+ledger.fail_interrupted()
+# Posting hash of every job with a live run in this process, by job id
+active_jobs = {}
+active_jobs_lock = threading.Lock()
+# Ids of jobs with a regeneration in flight; one at a time per job
+regenerating = set()
+regenerating_lock = threading.Lock()
+
+# Speculative extractions, started when a posting is opened in the browser
+# and keyed by posting hash. Unclaimed ones are cancelled after the TTL, or
+# when more than MAX_PREFETCHES are in flight.
+PREFETCH_TTL_SECONDS = int(os.getenv('PREFETCH_TTL_SECONDS', '900'))
+MAX_PREFETCHES = int(os.getenv('MAX_PREFETCHES', '3'))
+PREFETCH_KEY_PATTERN = re.compile(r'^[0-9a-f]{64}$')
+prefetches = {}
+prefetches_lock = threading.Lock()
+prefetch_reaper = None
+# Cancelled prefetches whose thread and output the reaper still has to clean up
+prefetch_cleanups = queue.Queue()
+
+# Line job_application_agents.py --batch prints when it starts a job
+BATCH_JOB_START = re.compile(r'🚀 Job ([A-Za-z0-9_-]+):')
+
+# In-memory batch state, keyed by batch id. Finished batches are dropped
+# BATCH_TTL_SECONDS after their last job ends.
+BATCH_TTL_SECONDS = int(os.getenv('BATCH_TTL_SECONDS', '3600'))
+batches = {}
+batches_lock = threading.Lock()
 
 @app.route('/health', methods=['GET'])
 def health():
@@ -37,80 +100,44 @@ def process_job():
         print(f"Location: {job_data.get('location', 'N/A')}")
         print(f"{'='*80}\n")
         
-        # Save job data to a temporary HTML file
-        with tempfile.NamedTemporaryFile(mode='w', suffix='.html', delete=False, dir='.') as f:
-            html_content = generate_html_from_job_data(job_data)
-            f.write(html_content)
-            temp_file = f.name
+        # Same posting already processed: hand back the stored documents
+        previous = find_reusable_job(job_data)
+        if previous:
+            print(f"♻️  Reusing documents of job {previous['id']}")
+            return jsonify({
+                'status': 'success',
+                'message': 'Reused previously generated CV and cover letter',
+                'job_id': previous['id'],
+                'artifacts': artifact_urls(previous['id']),
+                'reused': True
+            })
         
-        try:
-            # Get absolute path
-            temp_file_path = Path(temp_file).absolute()
-            file_url = f"file://{temp_file_path}"
-            
-            print(f"📝 Created temporary file: {temp_file_path}")
-            print(f"🚀 Processing with CrewAI...\n")
-            
-            # Run the job application script with real-time output
-            process = subprocess.Popen(
-                ['python', 'job_application_agents.py'],
-                stdin=subprocess.PIPE,
-                stdout=subprocess.PIPE,
-                stderr=subprocess.STDOUT,
-                text=True,
-                bufsize=1,
-                cwd=os.path.dirname(os.path.abspath(__file__))
-            )
-            
-            # Send the file URL as input
-            process.stdin.write(file_url + '\n')
-            process.stdin.close()
-            
-            # Stream output in real-time
-            output_lines = []
-            for line in process.stdout:
-                print(line, end='')  # Print to server console
-                output_lines.append(line)
-            
-            process.wait()
-            result_stdout = ''.join(output_lines)
-            result_returncode = process.returncode
+        job_id = begin_job(job_data)
+        result_returncode, result_stdout = run_recorded_job(job_id, job_data)
+        
+        if result_returncode == 0:
+            print(f"\n{'='*80}")
+            print(f"✅ SUCCESS: Documents generated! Job ID: {job_id}")
+            print(f"{'='*80}\n")
             
-            # Clean up temp file
-            try:
-                os.unlink(temp_file)
-            except:
-                pass
+            return jsonify({
+                'status': 'success',
+                'message': 'CV and cover letter generated successfully',
+                'job_id': job_id,
+                'artifacts': artifact_urls(job_id),
+                'output': result_stdout
+            })
+        else:
+            print(f"\n{'='*80}")
+            print(f"❌ ERROR: Processing failed")
+            print(f"Error output: {result_stdout}")
+            print(f"{'='*80}\n")
             
-            if result_returncode == 0:
-                print(f"\n{'='*80}")
-                print(f"✅ SUCCESS: Documents generated!")
-                print(f"{'='*80}\n")
-                
-                return jsonify({
-                    'status': 'success',
-                    'message': 'CV and cover letter generated successfully',
-                    'output': result_stdout
-                })
-            else:
-                print(f"\n{'='*80}")
-                print(f"❌ ERROR: Processing failed")
-                print(f"Error output: {result_stdout}")
-                print(f"{'='*80}\n")
-                
-                return jsonify({
-                    'status': 'error',
-                    'message': 'Failed to process job',
-                    'error': result_stdout
-                }), 500
-                
-        except Exception as e:
-            # Clean up temp file in case of error
-            try:
-                os.unlink(temp_file)
-            except:
-                pass
-            raise e
+            return jsonify({
+                'status': 'error',
+                'message': 'Failed to process job',
+                'error': result_stdout
+            }), 500
             
     except Exception as e:
         print(f"❌ Server error: {str(e)}")
@@ -119,44 +146,716 @@ def process_job():
             'message': str(e)
         }), 500
 
-def generate_html_from_job_data(job_data):
-    """Generate HTML content from job data"""
-    title = job_data.get('title', 'Job Title')
-    company = job_data.get('company', 'Company Name')
-    location = job_data.get('location', 'Location')
-    description = job_data.get('description', 'No description provided')
-    url = job_data.get('url', '')
-    
-    html = f"""<!DOCTYPE html>
-<html>
-<head>
-    <meta charset="UTF-8">
-    <title>{title} - {company}</title>
-</head>
-<body>
-    <h1>{title}</h1>
-    <h2>{company}</h2>
-    <p><strong>Location:</strong> {location}</p>
-    {f'<p><strong>Source:</strong> <a href="{url}">{url}</a></p>' if url else ''}
-    <hr>
-    <div class="job-description">
-        {description.replace(chr(10), '<br>')}
-    </div>
-</body>
-</html>"""
-    
-    return html
+@app.route('/process-jobs', methods=['POST'])
+def process_jobs():
+    """
+    Receive a batch of jobs from the browser extension and process them in the
+    background. Returns immediately with a batch id to poll for progress.
+    """
+    try:
+        payload = request.json or {}
+        jobs = payload.get('jobs') or []
+        
+        if not jobs:
+            return jsonify({'error': 'No jobs provided'}), 400
+        
+        # Drop postings captured twice (e.g. from a tab and a search card)
+        unique_jobs = []
+        seen_urls = set()
+        for job_data in jobs:
+            url = job_data.get('url', '')
+            if url and url in seen_urls:
+                continue
+            seen_urls.add(url)
+            unique_jobs.append(job_data)
+        
+        batch_id = uuid.uuid4().hex[:12]
+        batch = {
+            'id': batch_id,
+            'created_at': datetime.now().isoformat(),
+            'jobs': [
+                {
+                    'id': new_job_id(),
+                    'title': job_data.get('title', ''),
+                    'company': job_data.get('company', ''),
+                    'url': job_data.get('url', ''),
+                    'status': 'queued',
+                    'message': ''
+                }
+                for job_data in unique_jobs
+            ]
+        }
+        with batches_lock:
+            prune_batches()
+            batches[batch_id] = batch
+        
+        print(f"\n{'='*80}")
+        print(f"📥 Received batch {batch_id} with {len(unique_jobs)} jobs from browser extension")
+        print(f"{'='*80}\n")
+        
+        worker = threading.Thread(target=run_batch, args=(batch_id, unique_jobs), daemon=True)
+        worker.start()
+        
+        return jsonify({'status': 'accepted', 'batch': batch}), 202
+        
+    except Exception as e:
+        print(f"❌ Server error: {str(e)}")
+        return jsonify({
+            'status': 'error',
+            'message': str(e)
+        }), 500
+
+@app.route('/batches/<batch_id>', methods=['GET'])
+def get_batch(batch_id):
+    """Per-job progress for a batch"""
+    with batches_lock:
+        prune_batches()
+        batch = batches.get(batch_id)
+        if batch is None:
+            return jsonify({'error': 'Unknown batch'}), 404
+        return jsonify({'status': 'ok', 'batch': batch})
+
+@app.route('/prefetch', methods=['POST'])
+def prefetch_job():
+    """
+    Speculatively run the extraction stage for a posting the user has opened.
+    If the posting is submitted later, its run starts from the extracted job
+    and only the writer and render stages remain.
+    """
+    job_data = request.json
+    if not job_data or not (job_data.get('description') or '').strip():
+        return jsonify({'error': 'No job description provided'}), 400
+    
+    key = posting_hash(job_data)
+    if find_reusable_job(job_data):
+        return jsonify({'status': 'processed', 'prefetch_id': key})
+    # Already submitted (e.g. before the dwell ended): a prefetch would never be claimed
+    with active_jobs_lock:
+        submitted = key in active_jobs.values()
+    if submitted:
+        return jsonify({'status': 'processing', 'prefetch_id': key})
+    
+    with prefetches_lock:
+        entry = prefetches.get(key)
+        if entry and entry['status'] != 'error':
+            entry['last_seen'] = time.time()
+            return jsonify({'status': entry['status'], 'prefetch_id': key})
+        if entry:
+            # Retry a failed extraction instead of reporting it until the TTL
+            retire_prefetch(key)
+        
+        entry = {
+            'job_id': new_job_id(),
+            'title': job_data.get('title', ''),
+            'status': 'extracting',
+            'process': None,
+            'last_seen': time.time()
+        }
+        entry['thread'] = threading.Thread(target=run_prefetch, args=(job_data, entry), daemon=True)
+        prefetches[key] = entry
+        
+        # Keep speculative LLM spend bounded: drop the stalest extra prefetches
+        stale = sorted(
+            (other for other in prefetches if other != key),
+            key=lambda other: prefetches[other]['last_seen']
+        )[:max(0, len(prefetches) - MAX_PREFETCHES)]
+        for other in stale:
+            retire_prefetch(other)
+    
+    print(f"🔮 Prefetching extraction for: {entry['title'] or key[:12]}")
+    entry['thread'].start()
+    start_prefetch_reaper()
+    return jsonify({'status': 'extracting', 'prefetch_id': key}), 202
+
+@app.route('/prefetch/<key>', methods=['DELETE'])
+def delete_prefetch(key):
+    """Cancel a speculative extraction for a posting that was not submitted"""
+    if not PREFETCH_KEY_PATTERN.match(key):
+        abort(404)
+    cancelled = cancel_prefetch(key)
+    return jsonify({'status': 'cancelled' if cancelled else 'unknown', 'prefetch_id': key})
+
+def run_prefetch(job_data, entry):
+    """Run only the extraction stage into the job directory reserved for the posting"""
+    def on_start(process):
+        with prefetches_lock:
+            entry['process'] = process
+            cancelled = entry['status'] == 'cancelled'
+        if cancelled:
+            process.terminate()
+    
+    returncode, _ = run_job_pipeline(
+        job_data, job_output_dir(entry['job_id']), stop_after='extraction', on_start=on_start
+    )
+    with prefetches_lock:
+        if entry['status'] != 'cancelled':
+            entry['status'] = 'ready' if returncode == 0 else 'error'
+
+def claim_prefetch(job_data):
+    """
+    Take over the speculative extraction of a submitted posting, waiting for
+    it if it is still running. Returns its job id, or None if there is none.
+    """
+    with prefetches_lock:
+        entry = prefetches.pop(posting_hash(job_data), None)
+    if entry is None:
+        return None
+    if entry['thread'].is_alive():
+        print(f"⏳ Waiting for the prefetched extraction of job {entry['job_id']}")
+        entry['thread'].join()
+    return entry['job_id']
+
+def cancel_prefetch(key):
+    """Stop a speculative extraction; its output is discarded in the background"""
+    with prefetches_lock:
+        return retire_prefetch(key)
+
+def retire_prefetch(key):
+    """
+    Remove a prefetch, stop its subprocess and queue its cleanup for the
+    reaper thread, so no request waits for it. Call with prefetches_lock held.
+    """
+    entry = prefetches.pop(key, None)
+    if entry is None:
+        return False
+    entry['status'] = 'cancelled'
+    process = entry['process']
+    if process is not None and process.poll() is None:
+        process.terminate()
+    prefetch_cleanups.put(entry)
+    return True
+
+def cleanup_prefetch(entry):
+    """Wait for a cancelled prefetch's thread and delete its job directory"""
+    if entry['thread'].is_alive():
+        entry['thread'].join(timeout=30)
+    shutil.rmtree(job_output_dir(entry['job_id']), ignore_errors=True)
+    print(f"🗑️  Cancelled prefetch for: {entry['title'] or entry['job_id']}")
+
+def start_prefetch_reaper():
+    """Start the thread that cancels prefetches nobody claimed within the TTL"""
+    global prefetch_reaper
+    with prefetches_lock:
+        if prefetch_reaper is not None:
+            return
+        prefetch_reaper = threading.Thread(target=reap_prefetches, daemon=True)
+    prefetch_reaper.start()
+
+def reap_prefetches():
+    """Clean up cancelled prefetches as they come, and expire unclaimed ones every minute"""
+    next_expiry = time.time() + 60
+    while True:
+        try:
+            cleanup_prefetch(prefetch_cleanups.get(timeout=max(0, next_expiry - time.time())))
+        except queue.Empty:
+            pass
+        now = time.time()
+        if now < next_expiry:
+            continue
+        next_expiry = now + 60
+        with prefetches_lock:
+            for key in [
+                key for key, entry in prefetches.items()
+                if now - entry['last_seen'] > PREFETCH_TTL_SECONDS
+            ]:
+                retire_prefetch(key)
+
+@app.route('/jobs', methods=['GET'])
+def job_history():
+    """Processed jobs, newest first"""
+    limit = max(1, min(request.args.get('limit', 50, type=int), 500))
+    offset = max(0, request.args.get('offset', 0, type=int))
+    return jsonify({'status': 'ok', 'jobs': ledger.list_jobs(limit, offset)})
+
+@app.route('/jobs/search', methods=['GET'])
+def search_jobs():
+    """Full-text search over processed postings"""
+    query = request.args.get('q', '').strip()
+    if not query:
+        return jsonify({'error': 'No search query provided'}), 400
+    limit = max(1, min(request.args.get('limit', 20, type=int), 200))
+    return jsonify({'status': 'ok', 'jobs': ledger.search(query, limit)})
+
+@app.route('/jobs/<job_id>', methods=['GET'])
+def get_job(job_id):
+    """Full ledger record of a job, including its generated JSON"""
+    job = ledger.get_job(job_id)
+    if job is None:
+        return jsonify({'error': 'Unknown job'}), 404
+    job['artifact_urls'] = artifact_urls(job_id)
+    return jsonify({'status': 'ok', 'job': job})
+
+@app.route('/jobs/<job_id>/artifacts', methods=['GET'])
+def list_artifacts(job_id):
+    """Artifacts available for a job"""
+    output_dir = job_output_dir(job_id)
+    if not os.path.isdir(output_dir):
+        return jsonify({'error': 'Unknown job'}), 404
+    return jsonify({'status': 'ok', 'job_id': job_id, 'artifacts': artifact_urls(job_id)})
+
+@app.route('/jobs/<job_id>/artifacts/<name>', methods=['GET'])
+def get_artifact(job_id, name):
+    """
+    Serve one generated file. send_file answers If-None-Match with 304 and
+    Range requests with 206, and hands the open file to the WSGI server's
+    file wrapper (sendfile under e.g. gunicorn) or to X-Sendfile.
+    """
+    if name not in ARTIFACT_NAMES:
+        abort(404)
+    path = os.path.join(job_output_dir(job_id), name)
+    if not os.path.isfile(path):
+        abort(404)
+    return send_file(path, conditional=True, etag=True, max_age=0)
+
+@app.route('/jobs/<job_id>/regenerate', methods=['POST'])
+def regenerate_job(job_id):
+    """
+    Regenerate one document, one cover letter paragraph or one CV experience
+    item of a finished job, reusing its extraction and the other document
+    """
+    output_dir = job_output_dir(job_id)
+    job = ledger.get_job(job_id)
+    if job is None or not os.path.isdir(output_dir):
+        return jsonify({'error': 'Unknown job'}), 404
+    if job['status'] != 'done':
+        return jsonify({'error': 'Job has not finished processing'}), 409
+    
+    regen_request = request.json or {}
+    error = regenerate_request_error(regen_request, job)
+    if error:
+        return jsonify({'error': error}), 400
+    
+    with regenerating_lock:
+        if job_id in regenerating:
+            return jsonify({'error': 'Job is already being regenerated'}), 409
+        regenerating.add(job_id)
+    try:
+        print(f"\n✏️  Regenerating {regen_request['document']} of job {job_id}")
+        returncode, stdout = run_agents_script([
+            '--regenerate', output_dir,
+            '--request', json.dumps(regen_request)
+        ])
+    finally:
+        with regenerating_lock:
+            regenerating.discard(job_id)
+    if returncode != 0:
+        return jsonify({
+            'status': 'error',
+            'message': 'Failed to regenerate document',
+            'error': stdout
+        }), 500
+    
+    field = regen_request['document']
+    try:
+        with open(os.path.join(output_dir, f'{field}.json')) as f:
+            ledger.update_job(job_id, **{field: json.load(f)})
+    except (OSError, ValueError) as e:
+        print(f"⚠️  Could not update ledger for job {job_id}: {e}")
+    
+    return jsonify({
+        'status': 'success',
+        'message': f'{field} regenerated',
+        'job_id': job_id,
+        'document': field,
+        'artifacts': artifact_urls(job_id),
+        'output': stdout
+    })
+
+def regenerate_request_error(regen_request, job):
+    """Why a regeneration request cannot apply to the job's documents, or None"""
+    if not isinstance(regen_request, dict):
+        return 'Request must be a JSON object'
+    document = regen_request.get('document')
+    if document not in ('cv', 'cover_letter'):
+        return 'document must be "cv" or "cover_letter"'
+    data = job.get(document) or {}
+    
+    fragments = [name for name in ('paragraph', 'experience') if name in regen_request]
+    if len(fragments) > 1:
+        return 'Send either paragraph or experience, not both'
+    if fragments:
+        name = fragments[0]
+        items, expected = (('paragraphs', 'cover_letter') if name == 'paragraph'
+                           else ('experience', 'cv'))
+        if document != expected:
+            return f'{name} applies to the {expected} document'
+        index = regen_request[name]
+        count = len(data.get(items) or [])
+        if isinstance(index, bool) or not isinstance(index, int) or not 0 <= index < count:
+            return f'{name} must be an integer between 0 and {count - 1}'
+    
+    overrides = regen_request.get('overrides', {})
+    if not isinstance(overrides, dict):
+        return 'overrides must be an object'
+    for field in overrides:
+        if field not in data or isinstance(data[field], (list, dict)):
+            return f'{field} cannot be overridden on {document}'
+    if overrides:
+        # Only errors in the overridden fields count; the rest was already accepted
+        model = CV if document == 'cv' else CoverLetter
+        try:
+            model.model_validate({**data, **overrides})
+        except ValidationError as e:
+            for err in e.errors():
+                if err['loc'] and err['loc'][0] in overrides:
+                    return f"{err['loc'][0]}: {err['msg']}"
+    
+    if not isinstance(regen_request.get('instructions', ''), str):
+        return 'instructions must be a string'
+    return None
+
+@app.route('/jobs/<job_id>/artifacts.zip', methods=['GET'])
+def get_artifacts_zip(job_id):
+    """Stream all artifacts of a job as one zip, built on the fly"""
+    output_dir = job_output_dir(job_id)
+    files = [
+        (name, os.path.join(output_dir, name))
+        for name in ARTIFACT_NAMES
+        if os.path.isfile(os.path.join(output_dir, name))
+    ]
+    if not files:
+        abort(404)
+    
+    # The archive is a pure function of the files, so their stats make a stable ETag
+    signature = hashlib.sha256()
+    for name, path in files:
+        stat = os.stat(path)
+        signature.update(f"{name}:{stat.st_size}:{stat.st_mtime_ns};".encode())
+    etag = signature.hexdigest()[:32]
+    
+    if request.if_none_match.contains(etag):
+        response = Response(status=304)
+        response.set_etag(etag)
+        return response
+    
+    response = Response(stream_with_context(generate_zip(files)), mimetype='application/zip')
+    response.set_etag(etag)
+    response.headers['Content-Disposition'] = f'attachment; filename="job-{job_id}.zip"'
+    return response
+
+class ZipStream:
+    """Write-only file object that hands zip bytes on as they are produced"""
+    def __init__(self):
+        self.chunks = []
+    
+    def write(self, data):
+        self.chunks.append(bytes(data))
+        return len(data)
+    
+    def flush(self):
+        pass
+    
+    def drain(self):
+        data = b''.join(self.chunks)
+        self.chunks = []
+        return data
+
+def generate_zip(files):
+    """Yield a zip of the given (name, path) files chunk by chunk"""
+    stream = ZipStream()
+    # PDFs and JPEGs are already compressed, so store them as-is
+    with zipfile.ZipFile(stream, 'w', compression=zipfile.ZIP_STORED) as archive:
+        for name, path in files:
+            with open(path, 'rb') as source, archive.open(zipfile.ZipInfo.from_file(path, name), 'w') as entry:
+                while True:
+                    chunk = source.read(ZIP_CHUNK_SIZE)
+                    if not chunk:
+                        break
+                    entry.write(chunk)
+                    yield stream.drain()
+    yield stream.drain()
+
+def generation_inputs_hash():
+    """Hash of GENERATION_INPUTS as they are on disk now"""
+    return inputs_hash(
+        path
+        for pattern in GENERATION_INPUTS
+        for path in glob.glob(os.path.join(BASE_DIR, pattern))
+    )
+
+def find_reusable_job(job_data):
+    """
+    A finished job for the same posting, generated from the current base
+    documents, prompts and templates, whose artifacts are still on disk;
+    unless the client asked for fresh documents with "reuse": false
+    """
+    if job_data.get('reuse') is False:
+        return None
+    previous = ledger.find_completed(job_data, generation_inputs_hash())
+    if not previous:
+        return None
+    output_dir = job_output_dir(previous['id'])
+    if all(os.path.isfile(os.path.join(output_dir, name)) for name in ARTIFACT_NAMES):
+        return previous
+    return None
+
+def begin_job(job_data, job_id=None):
+    """
+    Ledger record for a posting about to be processed. Picks up a speculative
+    extraction of the posting if there is one, or else the latest failed run
+    with the same inputs so it resumes from its checkpoints; otherwise records
+    a new job (job_id, or a fresh id). Returns the job id.
+    """
+    inputs = generation_inputs_hash()
+    claimed_id = claim_prefetch(job_data)
+    resumed_id = None if claimed_id else ledger.resume_failed(job_data, inputs)
+    if resumed_id:
+        print(f"🔁 Resuming failed job {resumed_id} from its checkpoints")
+        job_id = resumed_id
+    else:
+        job_id = claimed_id or job_id or new_job_id()
+        ledger.record_posting(job_id, job_data, inputs)
+    # Owned by this process until record_job_result
+    with active_jobs_lock:
+        active_jobs[job_id] = posting_hash(job_data)
+    return job_id
+
+def run_recorded_job(job_id, job_data):
+    """
+    Run the pipeline for a job started with begin_job. Its ledger record gets
+    a final status even if the run raises. Returns (returncode, stdout).
+    """
+    started = time.perf_counter()
+    returncode, stdout = 1, 'Processing was interrupted'
+    try:
+        returncode, stdout = run_job_pipeline(job_data, job_output_dir(job_id))
+    finally:
+        record_job_result(job_id, returncode, stdout, started)
+    return returncode, stdout
+
+def record_job_result(job_id, returncode, stdout, started):
+    """Store the outputs job_application_agents.py left in the job directory"""
+    with active_jobs_lock:
+        active_jobs.pop(job_id, None)
+    output_dir = job_output_dir(job_id)
+    outputs = {}
+    for field, name in (('job', 'job.json'), ('cv', 'cv.json'),
+                        ('cover_letter', 'cover_letter.json'), ('timings', 'timings.json')):
+        try:
+            with open(os.path.join(output_dir, name)) as f:
+                outputs[field] = json.load(f)
+        except (OSError, ValueError):
+            outputs[field] = None
+    
+    timings = outputs['timings'] or {}
+    timings['total_seconds'] = round(time.perf_counter() - started, 3)
+    outputs['timings'] = timings
+    
+    artifacts = {
+        name: os.path.join(output_dir, name)
+        for name in ARTIFACT_NAMES
+        if os.path.isfile(os.path.join(output_dir, name))
+    }
+    succeeded = returncode == 0 and len(artifacts) == len(ARTIFACT_NAMES)
+    ledger.update_job(
+        job_id,
+        status='done' if succeeded else 'error',
+        error=None if succeeded else stdout[-2000:],
+        artifacts=artifacts,
+        **outputs
+    )
+
+def new_job_id():
+    """Short random id naming a job and its output directory"""
+    return uuid.uuid4().hex[:12]
+
+def job_output_dir(job_id):
+    """Output directory of a job; unknown-looking ids are rejected"""
+    if not JOB_ID_PATTERN.match(job_id):
+        abort(404)
+    return os.path.join(JOBS_OUTPUT_DIR, job_id)
+
+def artifact_urls(job_id):
+    """Download URLs for a job's artifacts, relative to the server"""
+    urls = {name: f"/jobs/{job_id}/artifacts/{name}" for name in ARTIFACT_NAMES}
+    urls['zip'] = f"/jobs/{job_id}/artifacts.zip"
+    return urls
+
+def run_batch(batch_id, jobs):
+    """
+    Process the jobs of a batch in a single job_application_agents.py --batch
+    process, so they share its agents, LLM clients, fonts, parsed templates
+    and render workers. Per-job status follows the process's output.
+    """
+    pending = {}
+    for job_state, job_data in zip(batches[batch_id]['jobs'], jobs):
+        previous = find_reusable_job(job_data)
+        if previous:
+            with batches_lock:
+                job_state['id'] = previous['id']
+                job_state['status'] = 'done'
+                job_state['message'] = 'Reused previously generated documents'
+                job_state['artifacts'] = artifact_urls(previous['id'])
+            continue
+        
+        try:
+            job_id = begin_job(job_data, job_state['id'])
+        except Exception as e:
+            with batches_lock:
+                job_state['status'] = 'error'
+                job_state['message'] = str(e)
+            continue
+        with batches_lock:
+            job_state['id'] = job_id
+        pending[job_id] = (job_state, job_data)
+    
+    try:
+        if pending:
+            run_batch_pipeline(batch_id, pending)
+    finally:
+        with batches_lock:
+            batches[batch_id]['finished_at'] = time.time()
+
+def run_batch_pipeline(batch_id, pending):
+    """
+    Run the begun jobs in pending ({job id: (job state, job data)}) through
+    one --batch process. A job counts as processing from its "🚀 Job <id>:"
+    line and is recorded as soon as its result line is written. Jobs without
+    a result when the process ends are recorded as failed.
+    """
+    work_dir = tempfile.mkdtemp(prefix='crewai-batch-')
+    batch_file = os.path.join(work_dir, 'jobs.jsonl')
+    results_file = os.path.join(work_dir, 'results.jsonl')
+    with open(batch_file, 'w') as f:
+        for job_id, (_, job_data) in pending.items():
+            f.write(json.dumps({**job_data, 'id': job_id}) + '\n')
+    open(results_file, 'w').close()
+    
+    current = {'id': None, 'offset': 0}
+    job_lines = {job_id: [] for job_id in pending}
+    started = {job_id: time.perf_counter() for job_id in pending}
+    
+    def finish(job_id, returncode, stdout):
+        job_state, _ = pending.pop(job_id)
+        record_job_result(job_id, returncode, stdout, started[job_id])
+        with batches_lock:
+            job_state['status'] = 'done' if returncode == 0 else 'error'
+            job_state['message'] = job_output_dir(job_id) if returncode == 0 else stdout[-500:]
+            if returncode == 0:
+                job_state['artifacts'] = artifact_urls(job_id)
+        print(f"{'✅' if returncode == 0 else '❌'} Batch {batch_id}: {job_state['title']} → {job_state['status']}")
+    
+    def read_results():
+        with open(results_file, 'rb') as f:
+            f.seek(current['offset'])
+            for line in f:
+                if not line.endswith(b'\n'):
+                    break
+                current['offset'] += len(line)
+                result = json.loads(line)
+                job_id = result.get('id')
+                if job_id in pending:
+                    stdout = ''.join(job_lines[job_id])
+                    if result.get('status') == 'error':
+                        finish(job_id, 1, stdout or result.get('error', ''))
+                    else:
+                        finish(job_id, 0, stdout)
+    
+    def on_line(line):
+        match = BATCH_JOB_START.search(line)
+        if match:
+            read_results()
+            current['id'] = match.group(1)
+            if current['id'] in pending:
+                started[current['id']] = time.perf_counter()
+                with batches_lock:
+                    pending[current['id']][0]['status'] = 'processing'
+        if current['id'] in job_lines:
+            job_lines[current['id']].append(line)
+    
+    try:
+        print(f"🚀 Processing batch {batch_id} with CrewAI...\n")
+        run_agents_script([
+            '--batch', batch_file,
+            '--results', results_file,
+            '--output-root', JOBS_OUTPUT_DIR
+        ], on_line=on_line, single_job=len(pending) == 1)
+        read_results()
+    finally:
+        for job_id in list(pending):
+            finish(job_id, 1, ''.join(job_lines[job_id]) or 'Batch process ended before this job finished')
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+def prune_batches():
+    """Forget finished batches past their TTL; call with batches_lock held"""
+    now = time.time()
+    for batch_id in [
+        batch_id for batch_id, batch in batches.items()
+        if 'finished_at' in batch and now - batch['finished_at'] > BATCH_TTL_SECONDS
+    ]:
+        del batches[batch_id]
+
+def run_job_pipeline(job_data, output_dir, stop_after=None, on_start=None):
+    """
+    Run job_application_agents.py in headless batch mode for one job,
+    streaming its output to the server console. output_dir is also the job's
+    checkpoint directory, so a failed job resumes from its last completed
+    stage when run again. on_start receives the subprocess, e.g. to be able
+    to terminate it. Returns (returncode, stdout).
+    """
+    job_id = os.path.basename(output_dir)
+    work_dir = tempfile.mkdtemp(prefix='crewai-job-')
+    batch_file = os.path.join(work_dir, 'job.jsonl')
+    with open(batch_file, 'w') as f:
+        f.write(json.dumps({**job_data, 'id': job_id}) + '\n')
+    
+    command = [
+        '--batch', batch_file,
+        '--results', os.path.join(work_dir, 'results.jsonl'),
+        '--output-root', os.path.dirname(output_dir)
+    ]
+    if stop_after:
+        command += ['--stop-after', stop_after]
+    
+    try:
+        print(f"🚀 Processing with CrewAI...\n")
+        return run_agents_script(command, on_start)
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+def run_agents_script(args, on_start=None, on_line=None, single_job=True):
+    """
+    Run job_application_agents.py with the given arguments, streaming its
+    output to the server console and to on_line. Returns (returncode, stdout).
+    """
+    env = {**os.environ, 'PYTHONUNBUFFERED': '1'}
+    if single_job:
+        # One job per process: a render worker pool would only add start-up cost
+        env['RENDER_WORKERS'] = '0'
+    process = subprocess.Popen(
+        ['python', 'job_application_agents.py'] + args,
+        stdout=subprocess.PIPE,
+        stderr=subprocess.STDOUT,
+        text=True,
+        bufsize=1,
+        cwd=BASE_DIR,
+        env=env
+    )
+    if on_start:
+        on_start(process)
+    
+    # Stream output in real-time
+    output_lines = []
+    for line in process.stdout:
+        print(line, end='')  # Print to server console
+        output_lines.append(line)
+        if on_line:
+            on_line(line)
+    
+    process.wait()
+    return process.returncode, ''.join(output_lines)
 
 if __name__ == '__main__':
     print("\n" + "="*80)
     print("🚀 CrewAI Job Processing Server")
     print("="*80)
-    print("\n📡 Server starting on http://localhost:5000")
+    print(f"\n📡 Server starting on http://{SERVER_HOST}:5000")
     print("\n✅ Ready to receive jobs from browser extension!")
     print("\n💡 Make sure to:")
     print("   1. Install the browser extension")
     print("   2. Navigate to a LinkedIn job posting")
     print("   3. Click the extension icon and 'Extract & Process Job'")
+    print("      (or 'Capture All Jobs' on a search results page)")
     print("\n" + "="*80 + "\n")
     
-    app.run(host='0.0.0.0', port=5000, debug=True)
+    app.run(host=SERVER_HOST, port=5000, debug=True)
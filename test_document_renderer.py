@@ -0,0 +1,60 @@
+"""
+Tests for the render cache pruning in document_renderer
+"""
+
+import os
+
+import pytest
+
+pytest.importorskip('pybars')
+pytest.importorskip('weasyprint')
+pytest.importorskip('pdf2image')
+
+from document_renderer import prune_render_cache
+
+MB = 1024 * 1024
+
+def add_entry(cache_dir, key, used, size_mb=1):
+    """Cache entry of a PDF plus report, last used at mtime used"""
+    for name, size in ((f'{key}.pdf', size_mb * MB), (f'{key}.json', 10)):
+        path = cache_dir / name
+        path.write_bytes(b'\0' * size)
+        os.utime(path, (used, used))
+
+def keys(cache_dir):
+    return {path.name.split('.', 1)[0] for path in cache_dir.iterdir() if not path.name.startswith('.')}
+
+def test_removes_least_recently_used_entries_first(tmp_path):
+    for used, key in enumerate(['old', 'mid', 'new']):
+        add_entry(tmp_path, key, 1000 + used)
+    assert prune_render_cache(tmp_path, max_mb=2) == 2
+    assert keys(tmp_path) == {'new'}
+
+def test_newest_file_of_an_entry_counts_as_its_last_use(tmp_path):
+    add_entry(tmp_path, 'a', 1000)
+    add_entry(tmp_path, 'b', 2000)
+    # A cache hit touches the report
+    os.utime(tmp_path / 'a.json', (3000, 3000))
+    assert prune_render_cache(tmp_path, max_mb=1.5) == 1
+    assert keys(tmp_path) == {'a'}
+
+def test_never_removes_kept_keys(tmp_path):
+    add_entry(tmp_path, 'old', 1000)
+    add_entry(tmp_path, 'new', 2000)
+    assert prune_render_cache(tmp_path, max_mb=1, keep={'old'}) == 1
+    assert keys(tmp_path) == {'old'}
+
+def test_leaves_cache_under_the_limit_alone(tmp_path):
+    add_entry(tmp_path, 'a', 1000)
+    add_entry(tmp_path, 'b', 2000)
+    assert prune_render_cache(tmp_path, max_mb=3) == 0
+    assert prune_render_cache(tmp_path, max_mb=0) == 0
+    assert keys(tmp_path) == {'a', 'b'}
+
+def test_skips_renders_in_progress(tmp_path):
+    add_entry(tmp_path, 'done', 2000)
+    (tmp_path / 'partial.pdf.tmp').write_bytes(b'\0' * 3 * MB)
+    (tmp_path / '.partial.jpg').write_bytes(b'\0' * 3 * MB)
+    assert prune_render_cache(tmp_path, max_mb=2) == 0
+    assert (tmp_path / 'partial.pdf.tmp').exists()
+    assert (tmp_path / '.partial.jpg').exists()
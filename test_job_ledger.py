@@ -0,0 +1,134 @@
+"""
+Tests for job_ledger
+"""
+
+import sqlite3
+
+import pytest
+
+from job_ledger import JobLedger, fts_query, job_id_for, parse_batch_line, posting_hash
+
+JOB = {'title': 'Data Engineer', 'company': 'Acme', 'location': 'Berlin',
+       'url': 'https://example.com/job/1', 'description': 'Build Spark pipelines'}
+
+@pytest.fixture
+def ledger(tmp_path):
+    return JobLedger(str(tmp_path / 'jobs.db'))
+
+def test_job_id_for_uses_own_id():
+    assert job_id_for({'id': 'acme-42_b', 'url': 'u'}) == 'acme-42_b'
+
+def test_job_id_for_accepts_numeric_id():
+    assert job_id_for({'id': 7}) == '7'
+
+def test_job_id_for_falls_back_to_posting_hash():
+    job = {'url': 'https://example.com/job/1', 'description': 'Build things'}
+    assert job_id_for(job) == posting_hash(job)[:12]
+    assert job_id_for({**job, 'id': ''}) == posting_hash(job)[:12]
+
+@pytest.mark.parametrize('job_id', ['../etc', 'a/b', '..', 'a b', '/abs'])
+def test_job_id_for_rejects_path_like_ids(job_id):
+    with pytest.raises(ValueError):
+        job_id_for({'id': job_id})
+
+def test_parse_batch_line_object():
+    job, job_id = parse_batch_line('{"url": "https://example.com/job/1", "id": "one"}', 1)
+    assert job == {'url': 'https://example.com/job/1', 'id': 'one'}
+    assert job_id == 'one'
+
+def test_parse_batch_line_bare_url():
+    job, job_id = parse_batch_line('"https://example.com/job/1"', 1)
+    assert job == {'url': 'https://example.com/job/1'}
+    assert job_id == posting_hash(job)[:12]
+
+@pytest.mark.parametrize('line', ['[1, 2]', '42', 'null', '{"url": '])
+def test_parse_batch_line_rejects_non_jobs(line):
+    with pytest.raises(ValueError):
+        parse_batch_line(line, 3)
+
+def test_resume_failed_takes_over_latest_failed_job_once(ledger):
+    ledger.record_posting('a' * 12, JOB, 'inputs')
+    ledger.update_job('a' * 12, status='error', error='boom')
+    assert ledger.resume_failed(JOB, 'other-inputs') is None
+    assert ledger.resume_failed(JOB, 'inputs') == 'a' * 12
+    # The conditional update lets only one submission resume it
+    assert ledger.resume_failed(JOB, 'inputs') is None
+    job = ledger.get_job('a' * 12)
+    assert job['status'] == 'processing'
+    assert job['error'] is None
+
+def test_fail_interrupted_makes_stuck_jobs_resumable(ledger):
+    ledger.record_posting('b' * 12, JOB, 'inputs')
+    ledger.record_posting('c' * 12, {**JOB, 'url': 'https://example.com/job/2'}, 'inputs')
+    ledger.update_job('c' * 12, status='done')
+    assert ledger.fail_interrupted() == 1
+    assert ledger.get_job('c' * 12)['status'] == 'done'
+    assert ledger.resume_failed(JOB, 'inputs') == 'b' * 12
+
+def test_find_completed_matches_posting_and_inputs(ledger):
+    ledger.record_posting('d' * 12, JOB, 'inputs')
+    assert ledger.find_completed(JOB, 'inputs') is None
+    ledger.update_job('d' * 12, status='done', cv={'full_name': 'Jane'})
+    assert ledger.find_completed(JOB, 'inputs')['cv'] == {'full_name': 'Jane'}
+    assert ledger.find_completed(JOB, 'other-inputs') is None
+    assert ledger.find_completed({**JOB, 'description': 'Something else'}, 'inputs') is None
+
+def test_inputs_hash_column_added_to_old_ledgers(tmp_path):
+    path = str(tmp_path / 'old.db')
+    connection = sqlite3.connect(path)
+    connection.execute(
+        """CREATE TABLE jobs (
+               id TEXT PRIMARY KEY, posting_hash TEXT NOT NULL, status TEXT NOT NULL,
+               created_at TEXT NOT NULL, updated_at TEXT NOT NULL,
+               title TEXT NOT NULL DEFAULT '', company TEXT NOT NULL DEFAULT '',
+               location TEXT NOT NULL DEFAULT '', url TEXT NOT NULL DEFAULT '',
+               description TEXT NOT NULL DEFAULT '', job_json TEXT, cv_json TEXT,
+               cover_letter_json TEXT, timings_json TEXT, artifacts_json TEXT, error TEXT)"""
+    )
+    connection.execute(
+        "INSERT INTO jobs (id, posting_hash, status, created_at, updated_at) VALUES (?, ?, 'done', '', '')",
+        ('e' * 12, posting_hash(JOB))
+    )
+    connection.commit()
+    connection.close()
+
+    ledger = JobLedger(path)
+    assert ledger.get_job('e' * 12)['inputs_hash'] == ''
+    assert ledger.find_completed(JOB, '')['id'] == 'e' * 12
+    ledger.record_posting('f' * 12, JOB, 'inputs')
+    assert ledger.get_job('f' * 12)['inputs_hash'] == 'inputs'
+
+def test_search_follows_inserts_updates_and_deletes(ledger):
+    ledger.record_posting('g' * 12, JOB, 'inputs')
+    assert [job['id'] for job in ledger.search('spark')] == ['g' * 12]
+    assert [job['id'] for job in ledger.search('pipe')] == ['g' * 12]
+
+    ledger.update_job('g' * 12, description='Maintain Kafka clusters')
+    assert ledger.search('spark') == []
+    assert [job['id'] for job in ledger.search('kafka')] == ['g' * 12]
+
+    with ledger._connect() as connection:
+        connection.execute('DELETE FROM jobs WHERE id = ?', ('g' * 12,))
+    assert ledger.search('kafka') == []
+
+@pytest.mark.parametrize('text, expected', [
+    ('spark', '"spark"*'),
+    ('  data   engineer ', '"data"* "engineer"*'),
+    ('a"b c', '"a""b"* "c"*'),
+    ('', ''),
+])
+def test_fts_query_quotes_terms(text, expected):
+    assert fts_query(text) == expected
+
+@pytest.mark.parametrize('text', ['"', 'title: OR', 'NEAR(a b)', '-spark', 'c++ *'])
+def test_search_treats_fts_syntax_as_text(ledger, text):
+    ledger.record_posting('h' * 12, JOB, 'inputs')
+    assert isinstance(ledger.search(text), list)
+
+def test_list_jobs_pages_newest_first(ledger):
+    for number, job_id in enumerate(['i' * 12, 'j' * 12, 'k' * 12]):
+        ledger.record_posting(job_id, {**JOB, 'url': f'https://example.com/job/{number}'})
+        with ledger._connect() as connection:
+            connection.execute('UPDATE jobs SET created_at = ? WHERE id = ?', (f'2024-01-0{number + 1}', job_id))
+    assert [job['id'] for job in ledger.list_jobs(2)] == ['k' * 12, 'j' * 12]
+    assert [job['id'] for job in ledger.list_jobs(2, 2)] == ['i' * 12]
@@ -0,0 +1,93 @@
+"""
+Tests for json_extractor.extract_json
+"""
+
+import json
+
+import pytest
+
+from json_extractor import extract_json
+
+def test_plain_object():
+    assert extract_json('{"name": "Ada"}') == {"name": "Ada"}
+
+def test_object_in_prose_and_code_fence():
+    text = 'Here is the CV:\n```json\n{"name": "Ada", "skills": ["x"]}\n```\nDone.'
+    assert extract_json(text) == {"name": "Ada", "skills": ["x"]}
+
+def test_braces_inside_strings_are_ignored():
+    text = '{"summary": "uses {curly} and [square] brackets \\" too"}'
+    assert extract_json(text) == {"summary": 'uses {curly} and [square] brackets " too'}
+
+def test_prefers_object_with_required_keys():
+    text = '{"example": true} then the answer {"name": "Ada", "email": "a@b.c"}'
+    assert extract_json(text, required_keys=("name", "email")) == {"name": "Ada", "email": "a@b.c"}
+
+def test_dict_is_returned_as_is():
+    data = {"name": "Ada"}
+    assert extract_json(data) is data
+
+def test_mismatched_bracket_is_skipped():
+    text = '{"broken": [1, 2} and later {"name": "Ada"}'
+    assert extract_json(text, required_keys=("name",)) == {"name": "Ada"}
+
+def test_stray_brace_in_prose_restarts_scan():
+    text = 'Use the { placeholder syntax. {"name": "Ada"'
+    assert extract_json(text, required_keys=("name",)) == {"name": "Ada"}
+
+def test_truncated_after_complete_value_is_closed():
+    assert extract_json('{"name": "Ada", "skills": ["x", "y"]') == {"name": "Ada", "skills": ["x", "y"]}
+
+def test_truncated_string_backs_off_to_last_complete_member():
+    text = '{"name": "Ada", "paragraphs": ["abc", "de'
+    assert extract_json(text) == {"name": "Ada", "paragraphs": ["abc"]}
+
+def test_truncated_key_is_dropped():
+    assert extract_json('{"name": "Ada", "ema') == {"name": "Ada"}
+
+def test_truncated_string_closed_only_as_last_resort():
+    assert extract_json('{"summary": "half a sent') == {"summary": "half a sent"}
+
+def test_truncated_string_after_escape():
+    assert extract_json('{"summary": "quote \\') == {"summary": "quote "}
+
+def test_repair_disabled_raises():
+    with pytest.raises(ValueError):
+        extract_json('{"name": "Ada", "skills": ["x"', repair=False)
+
+def test_no_object_raises():
+    with pytest.raises(ValueError):
+        extract_json("no JSON here")
+
+EXPERIENCE = '{"job_title": "x1", "company": "y1", "date_range": "2020", "responsibilities": ["a"]}'
+
+def test_truncated_nested_element_is_dropped_whole():
+    text = '{"name": "Ada", "experience": [' + EXPERIENCE + ', {"job_title": "x2", "company": "y'
+    assert extract_json(text) == {"name": "Ada", "experience": [json.loads(EXPERIENCE)]}
+
+def test_nested_element_cut_after_complete_value_is_dropped_whole():
+    text = '{"name": "Ada", "experience": [' + EXPERIENCE + ', {"job_title": "x2"'
+    assert extract_json(text) == {"name": "Ada", "experience": [json.loads(EXPERIENCE)]}
+
+def test_nested_object_member_kept_when_no_element_cut():
+    assert extract_json('{"contact": {"email": "a@b.c", "phone": "12') == {"contact": {"email": "a@b.c"}}
+
+def test_validate_moves_on_to_later_repair_attempts():
+    def three_skills(value):
+        if len(value.get("skills", [])) != 3:
+            raise ValueError("need three skills")
+    text = '{"skills": ["x", "y", "z'
+    assert extract_json(text) == {"skills": ["x", "y"]}
+    assert extract_json(text, validate=three_skills) == {"skills": ["x", "y", "z"]}
+
+def test_validate_prefers_valid_complete_object():
+    def needs_email(value):
+        if "email" not in value:
+            raise ValueError("no email")
+    text = '{"name": "Ada", "bio": "long long long"} {"email": "a@b.c"}'
+    assert extract_json(text, validate=needs_email) == {"email": "a@b.c"}
+
+def test_invalid_candidates_still_returned_when_nothing_validates():
+    def never(value):
+        raise ValueError("never valid")
+    assert extract_json('{"name": "Ada"}', validate=never) == {"name": "Ada"}
@@ -0,0 +1,87 @@
+"""
+Tests for the server's regeneration request checks
+"""
+
+import pytest
+
+pytest.importorskip('flask')
+pytest.importorskip('flask_cors')
+pytest.importorskip('pydantic')
+pytest.importorskip('email_validator')
+
+from server import regenerate_request_error
+
+PARAGRAPH = 'I am writing to apply for the Data Engineer role at Acme. ' * 2
+
+JOB = {
+    'cv': {
+        'full_name': 'Jane Doe',
+        'job_title': 'Data Engineer',
+        'location': 'Berlin',
+        'email': 'jane@example.com',
+        'phone': '+49 30 1234567',
+        'linkedin': 'linkedin.com/in/janedoe',
+        'professional_summary': 'Data engineer building batch and streaming pipelines on Spark and Kafka.',
+        'technical_skills': [{'category': 'Data', 'skills': 'Spark, Kafka'}],
+        'experience': [
+            {'job_title': 'Engineer', 'company': 'Initech', 'date_range': '2020 - 2024',
+             'responsibilities': ['Built pipelines']},
+            {'job_title': 'Intern', 'company': 'Hooli', 'date_range': '2019',
+             'responsibilities': ['Wrote tests']},
+        ],
+        'education': [{'degree': 'BSc Computer Science', 'institution': 'TU Berlin',
+                       'year': '2019', 'achievements': []}],
+        'certifications': [],
+    },
+    'cover_letter': {
+        'full_name': 'Jane Doe', 'address': '1 Main St', 'city': 'Berlin', 'state': 'BE',
+        'zip': '10115', 'email': 'jane@example.com', 'phone': '+49 30 1234567',
+        'date': '2024-02-07', 'hiring_manager_name': 'John Smith', 'job_title': 'Data Engineer',
+        'company_name': 'Acme', 'company_address': '2 Side St', 'company_city': 'Berlin',
+        'company_state': 'BE', 'company_zip': '10117',
+        'paragraphs': [PARAGRAPH, PARAGRAPH, PARAGRAPH],
+        'closing_paragraph': 'Thank you for considering my application.',
+    },
+}
+
+@pytest.mark.parametrize('regen_request', [
+    {'document': 'cv'},
+    {'document': 'cover_letter', 'paragraph': 2, 'instructions': 'Be brief'},
+    {'document': 'cv', 'experience': 1},
+    {'document': 'cv', 'overrides': {'job_title': 'Senior Data Engineer'}},
+    {'document': 'cover_letter', 'overrides': {'hiring_manager_name': 'Ann Lee'}},
+])
+def test_accepts_valid_requests(regen_request):
+    assert regenerate_request_error(regen_request, JOB) is None
+
+@pytest.mark.parametrize('regen_request', [
+    [],
+    {'document': 'resume'},
+    {'document': 'cv', 'paragraph': 0},
+    {'document': 'cover_letter', 'paragraph': 0, 'experience': 0},
+    {'document': 'cover_letter', 'paragraph': 3},
+    {'document': 'cover_letter', 'paragraph': True},
+    {'document': 'cv', 'experience': -1},
+    {'document': 'cv', 'overrides': []},
+    {'document': 'cv', 'overrides': {'salary': '100k'}},
+    {'document': 'cv', 'overrides': {'experience': []}},
+    {'document': 'cv', 'instructions': 5},
+])
+def test_rejects_malformed_requests(regen_request):
+    assert regenerate_request_error(regen_request, JOB)
+
+@pytest.mark.parametrize('document, overrides', [
+    ('cv', {'email': 'not an email'}),
+    ('cv', {'job_title': ''}),
+    ('cv', {'job_title': 'x' * 51}),
+    ('cv', {'phone': 123}),
+    ('cover_letter', {'state': 'Berlin'}),
+    ('cover_letter', {'date': 'yesterday'}),
+])
+def test_rejects_override_values_the_model_rejects(document, overrides):
+    error = regenerate_request_error({'document': document, 'overrides': overrides}, JOB)
+    assert error and error.startswith(next(iter(overrides)))
+
+def test_ignores_model_errors_outside_the_overrides():
+    job = {**JOB, 'cv': {**JOB['cv'], 'professional_summary': 'Too short'}}
+    assert regenerate_request_error({'document': 'cv', 'overrides': {'location': 'Paris'}}, job) is None